@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import auth
+import orm
+from transport import MemoryBroker, MemoryTransport
+
+
+# Stands in for the token and user SELECTs behind a validate request.
+def make_validate(latency):
+    async def validate(data):
+        await asyncio.sleep(latency)
+        return {'id': 1, 'email': 'bench@example.com', 'name': 'bench',
+                'created_date': '2020-01-01 00:00:00',
+                'last_login_date': '2020-01-01 00:00:00',
+                'expire_date': '2099-01-01 00:00:00'}
+    return validate
+
+
+# Runs `workers` AuthWorker instances on one in-memory 'auth' queue, so no
+# broker is needed. They share this process, so the numbers show how far
+# prefetch and concurrency overlap the database round trips rather than
+# how the service scales across cores.
+async def run_load(workers, args):
+    broker = MemoryBroker()
+    services = [auth.AuthWorker(MemoryTransport(broker), args.prefetch,
+                                args.concurrency) for _ in range(workers)]
+    for service in services:
+        await service.start()
+    client = MemoryTransport(broker)
+    pending = set()
+    finished = asyncio.Event()
+
+    def on_reply(message):
+        pending.discard(message.correlation_id)
+        if not pending:
+            finished.set()
+
+    replies = await client.consume(None, on_reply, no_ack=True)
+    ids = [str(uuid.uuid4()) for _ in range(args.messages)]
+    pending.update(ids)
+    start = time.perf_counter()
+    for correlation_id in ids:
+        await client.publish(
+            'auth', json.dumps({'type': 'validate',
+                                'data': {'token': correlation_id}}).encode(),
+            correlation_id=correlation_id, reply_to=replies.queue)
+    await asyncio.wait_for(finished.wait(), args.timeout)
+    elapsed = time.perf_counter() - start
+    await replies.cancel()
+    for service in services:
+        await service.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--prefetch', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--db', action='store_true',
+                        help='validate against the MySQL database from '
+                             'orm.db_config instead of a stand-in')
+    parser.add_argument('--db-latency', type=float, default=0.002,
+                        help='seconds the stand-in takes per request')
+    args = parser.parse_args()
+
+    if not args.db:
+        auth.validate = make_validate(args.db_latency)
+    loop = asyncio.get_event_loop()
+    results = {}
+    for workers in args.workers:
+        elapsed = loop.run_until_complete(run_load(workers, args))
+        results[f'{workers} workers'] = {
+            'seconds': round(elapsed, 3),
+            'messages_per_sec': round(args.messages / elapsed, 1),
+        }
+    if args.db:
+        loop.run_until_complete(orm.close())
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
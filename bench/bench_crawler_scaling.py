@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+import crawler
+from orm import Stat, Page
+from bench.fakes import FakeElasticsearch, make_site_app, start_app
+
+
+# Needs the MySQL database from orm.db_config; the website and
+# Elasticsearch are local stand-ins served from this process.
+async def run(workers, site, es_hosts, args):
+    supervisor = crawler.Supervisor(workers, es_hosts=es_hosts,
+                                    report_interval=0.2)
+    supervisor.start()
+    while supervisor.stats()['workers'] < workers:
+        await asyncio.sleep(0.1)
+
+    start = time.perf_counter()
+    for i in range(args.domains):
+        supervisor.dispatch({'domain': f'{site}/run{workers}-{start}-{i}',
+                             'author_id': 1, 'rps': args.rps})
+    while supervisor.stats().get('finished', 0) < args.domains:
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    stats = supervisor.stats()
+    await supervisor.stop()
+    return {
+        'seconds': round(elapsed, 2),
+        'pages': stats['pages'],
+        'pages_per_sec': round(stats['pages'] / elapsed, 1),
+    }
+
+
+async def bench(args):
+    await Stat.objects.migrate()
+    await Page.objects.migrate()
+    site_runner, site = await start_app(make_site_app(
+        pages=args.pages, links=args.links, delay=args.delay))
+    fake = FakeElasticsearch(latency=args.es_latency)
+    es_runner, es_base = await start_app(fake.app())
+    url = urlparse(es_base)
+    es_hosts = [{'host': url.hostname, 'port': url.port}]
+    await crawler.prepare_index(es_hosts)
+    results = {}
+    for workers in args.workers:
+        results[f'{workers} workers'] = await run(workers, site, es_hosts,
+                                                  args)
+    await site_runner.cleanup()
+    await es_runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--domains', type=int, default=16)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--links', type=int, default=20)
+    parser.add_argument('--rps', type=float, default=1000)
+    parser.add_argument('--delay', type=float, default=0,
+                        help='simulated server response time')
+    parser.add_argument('--es-latency', type=float, default=0.005)
+    args = parser.parse_args()
+    print(json.dumps(crawler.loop.run_until_complete(bench(args)),
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import sys
+import time
+from dedup import SeenUrls
+
+
+def make_url(i):
+    return f'http://bench.local/section{i % 1000}/page{i}?id={i}&ref=bench'
+
+
+# The previous Crawler.seen_urls value: a set of full URL strings.
+class StringSet:
+    def __init__(self):
+        self.urls = set()
+
+    def add(self, url):
+        if url in self.urls:
+            return False
+        self.urls.add(url)
+        return True
+
+    def nbytes(self):
+        return sys.getsizeof(self.urls) + sum(sys.getsizeof(url)
+                                              for url in self.urls)
+
+
+def run(seen, count):
+    start = time.perf_counter()
+    duplicates = 0
+    for i in range(count):
+        if not seen.add(make_url(i)):
+            duplicates += 1
+    elapsed = time.perf_counter() - start
+    return {
+        'megabytes': round(seen.nbytes() / 2 ** 20, 1),
+        'bytes_per_url': round(seen.nbytes() / count, 1),
+        'adds_per_sec': round(count / elapsed),
+        # Every generated URL is distinct, so anything reported as seen
+        # is a false positive.
+        'false_positive_rate': round(duplicates / count, 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--urls', type=int, default=10 ** 7)
+    parser.add_argument('--error-rate', type=float, default=0.001)
+    parser.add_argument('--max-mb', type=float, default=16,
+                        help='memory cap for the capped bloom filter')
+    parser.add_argument('--modes', nargs='+',
+                        default=['set', 'exact', 'bloom', 'bloom capped'])
+    args = parser.parse_args()
+
+    stores = {
+        'set': StringSet,
+        'exact': lambda: SeenUrls('exact'),
+        'bloom': lambda: SeenUrls('bloom', error_rate=args.error_rate),
+        'bloom capped': lambda: SeenUrls(
+            'bloom', error_rate=args.error_rate,
+            max_bytes=int(args.max_mb * 2 ** 20)),
+    }
+    results = {}
+    for mode in args.modes:
+        results[mode] = run(stores[mode](), args.urls)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from extract import extract, etree
+from bench.fakes import site_page
+
+
+ROOT = 'http://bench.local'
+
+
+# The previous Crawler.index_page + Crawler.parse_links pair: two
+# BeautifulSoup trees, a re-serialisation and two regex passes per page.
+def extract_bs4(html, root):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, features='html.parser')
+    [x.extract() for x in soup.find_all(['title', 'script', 'style',
+                                         'meta'])]
+    text = re.sub('<[^>]+>', '', str(soup))
+    text = re.sub(r'(\s){2,}', ' ', text)
+    links = set()
+    soup = BeautifulSoup(html, features='html.parser')
+    for link in soup.find_all('a'):
+        href = link.get('href')
+        if href is None:
+            continue
+        if '#' in href:
+            href = href.split('#', 1)[0]
+        if '../' in href:
+            href = href.split('../', 1)[1]
+        if root in href:
+            links.add(href)
+        elif 'https://' in href or 'http://' in href:
+            continue
+        else:
+            links.add(f'{root}/{href}')
+    return text, links
+
+
+def load_corpus(path, size):
+    if path is None:
+        filler = '<p>' + 'lorem ipsum dolor sit amet ' * 40 + '</p>'
+        return [site_page('bench', i, 1000, 50).replace('<body>',
+                '<body>' + filler * 20) for i in range(size)]
+    pages = []
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), encoding='utf-8',
+                  errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+
+def run(func, pages, *args):
+    start = time.perf_counter()
+    for html in pages:
+        func(html, ROOT, *args)
+    return time.perf_counter() - start
+
+
+def run_pool(pages, workers, backend):
+    with ProcessPoolExecutor(workers) as pool:
+        start = time.perf_counter()
+        list(pool.map(extract, pages, [ROOT] * len(pages),
+                      [backend] * len(pages), chunksize=16))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', help='directory of saved html pages')
+    parser.add_argument('--size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.size)
+    megabytes = sum(len(p) for p in pages) / 2 ** 20
+    timings = {}
+    try:
+        timings['bs4 (two trees)'] = run(extract_bs4, pages)
+    except ImportError:
+        pass
+    timings['html.parser'] = run(extract, pages, 'html.parser')
+    backend = 'html.parser'
+    if etree is not None:
+        timings['lxml'] = run(extract, pages, 'lxml')
+        backend = 'lxml'
+    timings[f'{backend} x{args.workers} processes'] = run_pool(
+        pages, args.workers, backend)
+
+    print(json.dumps({name: {
+        'seconds': round(seconds, 3),
+        'pages_per_sec': round(len(pages) / seconds, 1),
+        'mb_per_sec': round(megabytes / seconds, 2),
+    } for name, seconds in timings.items()}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
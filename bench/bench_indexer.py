@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+from aioelasticsearch import Elasticsearch
+from indexer import BulkIndexer
+from bench.fakes import FakeElasticsearch, start_app
+
+
+def make_docs(count):
+    return [{'url': f'http://bench.local/p{i}',
+             'content': f'synthetic page {i} ' * 50} for i in range(count)]
+
+
+async def index_single(es, docs, workers):
+    queue = list(docs)
+
+    async def work():
+        while queue:
+            await es.index(index='crawling', body=queue.pop())
+
+    await asyncio.gather(*(work() for _ in range(workers)))
+
+
+async def index_bulk(es, docs, workers, args):
+    indexer = BulkIndexer(es, 'crawling', max_docs=args.batch)
+    queue = list(docs)
+
+    async def work():
+        while queue:
+            await indexer.add(queue.pop())
+
+    await asyncio.gather(*(work() for _ in range(workers)))
+    await indexer.close()
+
+
+async def bench(args):
+    fake = FakeElasticsearch(latency=args.latency, fail_rate=args.fail_rate)
+    runner, base = await start_app(fake.app())
+    url = urlparse(base)
+    es = Elasticsearch(hosts=[{'host': url.hostname, 'port': url.port}])
+    docs = make_docs(args.docs)
+    results = {}
+    for mode in ('single', 'bulk'):
+        fake.indices.clear()
+        fake.requests = 0
+        start = time.perf_counter()
+        if mode == 'single':
+            await index_single(es, docs, args.workers)
+        else:
+            await index_bulk(es, docs, args.workers, args)
+        elapsed = time.perf_counter() - start
+        results[mode] = {
+            'seconds': round(elapsed, 3),
+            'docs_per_sec': round(len(docs) / elapsed, 1),
+            'es_requests': fake.requests,
+            'indexed': len(fake.indices.get('crawling', {})),
+        }
+    await es.close()
+    await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--fail-rate', type=float, default=0)
+    args = parser.parse_args()
+    loop = asyncio.get_event_loop()
+    print(json.dumps(loop.run_until_complete(bench(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import json
+import time
+import uuid
+import orm
+from orm import Token, User, Model, StringField, IntField, DatetimeField
+
+
+# Same columns as Token but in a scratch table that starts without any
+# indexes, so migrate() has something to add.
+class PlainToken(Model):
+    token = StringField(size=36)
+    user_id = IntField()
+    expire_date = DatetimeField()
+
+    class Meta:
+        table_name = 'BenchToken'
+
+
+class IndexedToken(PlainToken):
+    class Meta:
+        table_name = 'BenchToken'
+        indexes = Token.Meta.indexes
+        unique = Token.Meta.unique
+
+
+async def lookup(manager, token, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await manager.get(token=token)
+    return (time.perf_counter() - start) / repeat
+
+
+async def bench(args):
+    async with orm.Acquire() as conn:
+        await orm.execute(conn, 'DROP TABLE IF EXISTS BenchToken')
+    await PlainToken.objects.create_table()
+    tokens = [PlainToken(token=str(uuid.uuid4()), user_id=i,
+                         expire_date='2030-01-01 00:00:00')
+              for i in range(args.rows)]
+    await PlainToken.objects.bulk_create(tokens)
+    probe = tokens[len(tokens) // 2].token
+
+    results = {}
+    for name, model in (('before', PlainToken), ('after', IndexedToken)):
+        if name == 'after':
+            await model.objects.migrate()
+        plan = await model.objects.explain(token=probe)
+        results[name] = {
+            'key': plan[0]['key'],
+            'rows_examined': plan[0]['rows'],
+            'lookup_ms': round(await lookup(model.objects, probe,
+                                            args.repeat) * 1000, 3),
+        }
+    results['users_by_email'] = (await User.objects.explain(
+        email='nobody@example.com'))[0]['key']
+
+    async with orm.Acquire() as conn:
+        await orm.execute(conn, 'DROP TABLE BenchToken')
+    await orm.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(orm.loop.run_until_complete(bench(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
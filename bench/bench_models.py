@@ -0,0 +1,69 @@
+import argparse
+import json
+import time
+import tracemalloc
+from orm import Stat
+
+
+# Stat as it was built before ModelMeta generated slots: a per-instance
+# __dict__ filled by looping over Field.validate for every field.
+class LegacyStat:
+    _fields = Stat._fields
+
+    def __init__(self, **kwargs):
+        for field_name, field in self._fields.items():
+            value = field.validate(kwargs.get(field_name))
+            setattr(self, field_name, value)
+
+
+def make_kwargs(count):
+    return [{'domain': f'http://site{i}.local', 'status': 'Crawling',
+             'author_id': i % 100, 'https': 1,
+             'time': '2019-01-01 00:00:00', 'pages_count': i}
+            for i in range(count)]
+
+
+def construct(model_cls, rows):
+    start = time.perf_counter()
+    models = [model_cls(**kwargs) for kwargs in rows]
+    return time.perf_counter() - start, models
+
+
+def memory(model_cls, rows):
+    tracemalloc.start()
+    models = [model_cls(**kwargs) for kwargs in rows]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, models
+
+
+def access(models):
+    start = time.perf_counter()
+    total = 0
+    for model in models:
+        total += model.pages_count + model.author_id
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = make_kwargs(args.count)
+    results = {}
+    for name, model_cls in (('legacy', LegacyStat), ('slots', Stat)):
+        seconds, models = construct(model_cls, rows)
+        del models
+        allocated, models = memory(model_cls, rows)
+        results[name] = {
+            'constructions_per_sec': round(args.count / seconds),
+            'bytes_per_instance': round(allocated / args.count, 1),
+            'attribute_reads_per_sec': round(2 * args.count /
+                                             access(models)),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
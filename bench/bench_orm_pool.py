@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import time
+import orm
+from bench.load import percentile
+
+
+# The previous setup: every query goes through one shared connection,
+# which has to be serialised because aiomysql connections are not
+# safe for concurrent use.
+async def run_single(args):
+    conn = await orm.connect()
+    lock = asyncio.Lock()
+
+    async def query():
+        async with lock:
+            await orm.execute(conn, 'SELECT SLEEP(%s)', (args.sleep,),
+                              fetch=True)
+
+    try:
+        return await run_load(query, args)
+    finally:
+        conn.close()
+
+
+async def run_pool(args):
+    orm.configure(minsize=args.pool, maxsize=args.pool)
+    await orm.get_pool()
+
+    async def query():
+        async with orm.Acquire() as conn:
+            await orm.execute(conn, 'SELECT SLEEP(%s)', (args.sleep,),
+                              fetch=True)
+
+    try:
+        return await run_load(query, args)
+    finally:
+        await orm.close()
+
+
+async def run_load(query, args):
+    latencies = []
+
+    async def client():
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            await query()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'queries_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def bench(args):
+    return {'single': await run_single(args),
+            f'pool({args.pool})': await run_pool(args)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--pool', type=int, default=10)
+    parser.add_argument('--sleep', type=float, default=0.002,
+                        help='server-side query time in seconds')
+    args = parser.parse_args()
+    print(json.dumps(orm.loop.run_until_complete(bench(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import datetime
+import json
+import time
+from orm import Stat
+
+
+FIELDS = ['domain', 'status', 'author_id', 'https', 'time', 'pages_count']
+
+
+def make_rows(count):
+    stamp = datetime.datetime(2019, 1, 1)
+    return [(f'http://site{i}.local', 'Done', i % 100, 1, stamp, i)
+            for i in range(count)]
+
+
+def measure(manager, field_names, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        manager.build(field_names, rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    columns = ['domain', 'status', 'time', 'pages_count']
+    projected = [(row[0], row[1], row[4], row[5]) for row in rows]
+    modes = {
+        'model (SELECT *)': (Stat.objects, FIELDS, rows),
+        'only': (Stat.objects.only(*columns), columns, projected),
+        'values': (Stat.objects.values(*columns), columns, projected),
+        'values_list': (Stat.objects.values_list(*columns), columns,
+                        projected),
+    }
+    results = {}
+    for name, (manager, field_names, data) in modes.items():
+        seconds = measure(manager, field_names, data, args.repeat)
+        results[name] = {
+            'seconds': round(seconds, 4),
+            'rows_per_sec': round(len(data) / seconds),
+            'us_per_row': round(seconds / len(data) * 1e6, 3),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
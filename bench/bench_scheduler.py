@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from aiohttp import ClientSession, TCPConnector
+from scheduler import DomainScheduler
+from ratelimit import RateLimiter
+from bench.fakes import make_site_app, start_app
+
+
+LINK_RE = re.compile(r'href="([^"]+)"')
+
+
+class Counter:
+    def __init__(self):
+        self.pages = 0
+        self.in_flight = 0
+
+
+async def fetch(session, counter, url):
+    async with session.get(url) as response:
+        html = await response.text()
+    counter.pages += 1
+    return LINK_RE.findall(html)
+
+
+async def run_scheduler(session, domains, args, counter):
+    loop = asyncio.get_event_loop()
+    finished = asyncio.Event()
+    remaining = [len(domains)]
+    seen = {}
+
+    def on_done(domain):
+        remaining[0] -= 1
+        if not remaining[0]:
+            finished.set()
+
+    scheduler = DomainScheduler(RateLimiter(args.rps), on_done=on_done,
+                                loop=loop)
+
+    async def work():
+        while True:
+            root, (url, depth) = await scheduler.get()
+            try:
+                hrefs = await fetch(session, counter, url)
+                if depth + 1 < args.depth:
+                    for href in hrefs:
+                        link = f'{root}/{href}'
+                        if link not in seen[root]:
+                            seen[root].add(link)
+                            scheduler.put(root, (link, depth + 1))
+            finally:
+                scheduler.task_done(root)
+
+    for root in domains:
+        scheduler.add_domain(root)
+        seen[root] = {root}
+        scheduler.put(root, (root, 0))
+    workers = [loop.create_task(work()) for _ in range(args.tasks)]
+    await finished.wait()
+    return workers
+
+
+# Reproduces the previous Crawler.work loop: every worker wakes each
+# millisecond, walks all domains and spin-waits on a deque of timestamps.
+async def run_polling(session, domains, args, counter):
+    loop = asyncio.get_event_loop()
+    queues = {}
+    timers = {}
+    seen = {}
+
+    async def is_rps_exceeded(root):
+        while True:
+            now = time.perf_counter()
+            while timers[root]:
+                if now - timers[root][0] > 1:
+                    timers[root].popleft()
+                else:
+                    break
+            if len(timers[root]) < args.rps:
+                break
+            await asyncio.sleep(0.05)
+        timers[root].append(time.perf_counter())
+
+    async def work():
+        while True:
+            await asyncio.sleep(0.001)
+            for root in domains:
+                if queues[root].empty():
+                    continue
+                url, depth = await queues[root].get()
+                counter.in_flight += 1
+                try:
+                    await is_rps_exceeded(root)
+                    hrefs = await fetch(session, counter, url)
+                    if depth + 1 < args.depth:
+                        for href in hrefs:
+                            link = f'{root}/{href}'
+                            if link not in seen[root]:
+                                seen[root].add(link)
+                                queues[root].put_nowait((link, depth + 1))
+                finally:
+                    counter.in_flight -= 1
+
+    for root in domains:
+        queues[root] = asyncio.Queue()
+        queues[root].put_nowait((root, 0))
+        timers[root] = deque()
+        seen[root] = {root}
+    workers = [loop.create_task(work()) for _ in range(args.tasks)]
+    while counter.in_flight or any(not q.empty() for q in queues.values()):
+        await asyncio.sleep(0.05)
+    return workers
+
+
+async def bench(args):
+    runner, base = await start_app(make_site_app(pages=args.pages,
+                                                 links=args.links))
+    domains = [f'{base}/d{i}' for i in range(args.domains)]
+    connector = TCPConnector(limit=args.tasks)
+    results = {}
+    async with ClientSession(connector=connector) as session:
+        for mode in args.modes:
+            counter = Counter()
+            run = run_scheduler if mode == 'scheduler' else run_polling
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            workers = await run(session, domains, args, counter)
+            elapsed = time.perf_counter() - start
+            cpu_busy = time.process_time() - cpu_start
+
+            cpu_start = time.process_time()
+            await asyncio.sleep(args.idle)
+            cpu_idle = time.process_time() - cpu_start
+
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            results[mode] = {
+                'pages': counter.pages,
+                'seconds': round(elapsed, 3),
+                'pages_per_sec': round(counter.pages / elapsed, 1),
+                'busy_cpu_sec': round(cpu_busy, 3),
+                'idle_cpu_percent': round(100 * cpu_idle / args.idle, 2),
+            }
+    await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--domains', type=int, default=1000)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--links', type=int, default=5)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--tasks', type=int, default=10)
+    parser.add_argument('--rps', type=int, default=3)
+    parser.add_argument('--idle', type=float, default=5)
+    parser.add_argument('--modes', nargs='+', default=['scheduler',
+                                                       'polling'])
+    args = parser.parse_args()
+    loop = asyncio.get_event_loop()
+    print(json.dumps(loop.run_until_complete(bench(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlparse
+from aiohttp import ClientSession
+from aioelasticsearch import Elasticsearch
+import api
+from bench.fakes import FakeElasticsearch, start_app
+from bench.load import percentile
+
+
+def seed(fake, docs, words):
+    fake.indices['crawling'] = {
+        str(i): {'url': f'http://bench.local/p{i}',
+                 'content': f'synthetic page word{i % words} ' * 50}
+        for i in range(docs)}
+
+
+async def run_load(session, base, args):
+    latencies = []
+    words = list(range(args.words))
+    # Popular queries dominate real search traffic, which is what makes
+    # a result cache worth having.
+    weights = [1 / (rank + 1) for rank in words]
+
+    async def client():
+        for _ in range(args.requests):
+            word = random.choices(words, weights)[0]
+            start = time.perf_counter()
+            async with session.get(f'{base}/search', params={
+                    'q': f'word{word}', 'limit': 10, 'offset': 0,
+                    'mode': args.mode}) as resp:
+                await resp.read()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def paginate(session, base, args, cursor):
+    params = {'q': 'word0', 'limit': 10, 'offset': 0}
+    start = time.perf_counter()
+    for page in range(args.pages):
+        async with session.get(f'{base}/search', params=params) as resp:
+            data = await resp.json()
+        if data['next'] is None:
+            break
+        if cursor:
+            params['after'] = json.dumps(data['next'])
+        else:
+            params['offset'] += 10
+    return {'pages': page + 1,
+            'ms_per_page': round((time.perf_counter() - start) * 1000 /
+                                 (page + 1), 2)}
+
+
+async def bench(args):
+    fake = FakeElasticsearch(latency=args.latency)
+    es_runner, es_base = await start_app(fake.app())
+    url = urlparse(es_base)
+    api.es = Elasticsearch(hosts=[{'host': url.hostname, 'port': url.port}])
+    seed(fake, args.docs, args.words)
+    app = api.make_app()
+    app.on_startup.remove(api.on_startup)
+    app.on_cleanup.remove(api.on_cleanup)
+    runner, base = await start_app(app)
+    results = {}
+    async with ClientSession() as session:
+        for mode, maxsize in (('no cache', 0), ('cache', 1000)):
+            api.search_cache = api.TTLCache(maxsize=maxsize, ttl=60)
+            fake.requests = 0
+            result = await run_load(session, base, args)
+            result['es_requests'] = fake.requests
+            result['cache'] = api.search_cache.stats()
+            results[mode] = result
+        api.search_cache = api.TTLCache(maxsize=0, ttl=60)
+        results['offset pagination'] = await paginate(session, base, args,
+                                                      cursor=False)
+        results['search_after pagination'] = await paginate(
+            session, base, args, cursor=True)
+    await runner.cleanup()
+    await api.es.close()
+    await es_runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=5000)
+    parser.add_argument('--words', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='simulated Elasticsearch query time')
+    parser.add_argument('--mode', choices=api.search_modes, default='phrase')
+    args = parser.parse_args()
+    print(json.dumps(api.loop.run_until_complete(bench(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
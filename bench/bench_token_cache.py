@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from aiohttp import ClientSession
+import api
+from bench.fakes import start_app
+from bench.load import percentile
+
+
+# Stands in for the broker round trip and the two SELECTs behind it.
+class FakeAuthMS:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    async def make_request(self, type, data, timeout):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        expire = datetime.datetime.now() + datetime.timedelta(days=1)
+        user_id = int(data['token'].rsplit('-', 1)[1])
+        return {'status': 'ok', 'data': {
+            'id': user_id, 'email': f'user{user_id}@example.com',
+            'name': f'user{user_id}', 'created_date': '2019-01-01 00:00:00',
+            'last_login_date': '2019-01-01 00:00:00',
+            'expire_date': expire.strftime('%Y-%m-%d %H:%M:%S')}}
+
+    async def validate(self, token, timeout):
+        sent = time.monotonic()
+        return await self.make_request('validate', {'token': token},
+                                       timeout), sent
+
+
+async def run_load(session, base, args):
+    latencies = []
+
+    async def client(n):
+        for i in range(args.requests):
+            token = f'token-{(n * args.requests + i) % args.tokens}'
+            start = time.perf_counter()
+            async with session.get(f'{base}/current',
+                                   headers={'X-Token': token}) as resp:
+                await resp.read()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def bench(args):
+    app = api.make_app()
+    app.on_startup.remove(api.on_startup)
+    app.on_cleanup.remove(api.on_cleanup)
+    runner, base = await start_app(app)
+    results = {}
+    async with ClientSession() as session:
+        for mode, maxsize in (('no cache', 0), ('cache', args.tokens)):
+            api.auth_ms = FakeAuthMS(args.latency)
+            api.token_cache = api.TTLCache(maxsize=maxsize, ttl=300)
+            result = await run_load(session, base, args)
+            result['rpc_calls'] = api.auth_ms.requests
+            result['cache'] = api.token_cache.stats()
+            results[mode] = result
+    await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--tokens', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.003,
+                        help='simulated broker + auth round trip')
+    args = parser.parse_args()
+    print(json.dumps(api.loop.run_until_complete(bench(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import random
+from aiohttp import web
+
+
+def site_page(domain, page, pages, links):
+    hrefs = ''.join(f'<a href="p{(page * 7 + i) % pages}">link {i}</a>'
+                    for i in range(1, links + 1))
+    return (f'<html><head><title>{domain} {page}</title></head>'
+            f'<body><h1>Page {page} of {domain}</h1>'
+            f'<p>Synthetic content for benchmarking the crawler.</p>'
+            f'{hrefs}</body></html>')
+
+
+def make_site_app(pages=20, links=5, delay=0):
+    async def handler(request):
+        if delay:
+            await asyncio.sleep(delay)
+        domain = request.match_info['domain']
+        page = request.match_info.get('page', 'p0')
+        try:
+            number = int(page.lstrip('p'))
+        except ValueError:
+            raise web.HTTPNotFound()
+        return web.Response(text=site_page(domain, number, pages, links),
+                            content_type='text/html')
+
+    app = web.Application()
+    app.add_routes([web.get('/{domain}', handler),
+                    web.get('/{domain}/{page}', handler)])
+    return app
+
+
+async def start_app(app, host='127.0.0.1', port=0):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f'http://{host}:{port}'
+
+
+class FakeElasticsearch:
+    def __init__(self, latency=0, fail_rate=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.indices = {}
+        self.mappings = {}
+        self.aliases = {}
+        self.settings_updates = []
+        self.refreshes = 0
+        self.requests = 0
+        self.counter = 0
+
+    def app(self):
+        app = web.Application(client_max_size=2 ** 30)
+        app.add_routes([
+            web.head('/_alias/{name}', self.alias_exists),
+            web.get('/_alias/{name}', self.get_alias, allow_head=False),
+            web.post('/_aliases', self.update_aliases),
+            web.post('/_reindex', self.reindex),
+            web.head('/{index}', self.exists),
+            web.put('/{index}', self.create),
+            web.put('/{index}/_settings', self.settings),
+            web.post('/{index}/_refresh', self.refresh),
+            web.post('/_bulk', self.bulk),
+            web.post('/{index}/_bulk', self.bulk),
+            web.get('/{index}/_search', self.search),
+            web.post('/{index}/_search', self.search),
+            web.get('/{index}/{doc_type}/_search', self.search),
+            web.post('/{index}/{doc_type}/_search', self.search),
+            web.post('/{index}/{doc_type}', self.index),
+            web.put('/{index}/{doc_type}/{id}', self.index),
+            web.post('/{index}/{doc_type}/{id}', self.index),
+        ])
+        return app
+
+    async def delay(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def failed(self):
+        return self.fail_rate and random.random() < self.fail_rate
+
+    def resolve(self, index):
+        return self.aliases.get(index, index)
+
+    async def exists(self, request):
+        await self.delay()
+        index = self.resolve(request.match_info['index'])
+        return web.Response(status=200 if index in self.mappings else 404)
+
+    async def alias_exists(self, request):
+        await self.delay()
+        status = 200 if request.match_info['name'] in self.aliases else 404
+        return web.Response(status=status)
+
+    async def get_alias(self, request):
+        await self.delay()
+        name = request.match_info['name']
+        if name not in self.aliases:
+            return web.json_response({'error': 'alias missing'}, status=404)
+        return web.json_response({self.aliases[name]: {
+            'aliases': {name: {}}}})
+
+    async def update_aliases(self, request):
+        await self.delay()
+        for action in (await request.json())['actions']:
+            if 'remove_index' in action:
+                index = action['remove_index']['index']
+                self.mappings.pop(index, None)
+                self.indices.pop(index, None)
+            elif 'add' in action:
+                self.aliases[action['add']['alias']] = action['add']['index']
+        return web.json_response({'acknowledged': True})
+
+    async def reindex(self, request):
+        await self.delay()
+        body = await request.json()
+        docs = self.indices.get(self.resolve(body['source']['index']), {})
+        dest = self.indices.setdefault(self.resolve(body['dest']['index']),
+                                       {})
+        dest.update(docs)
+        return web.json_response({'took': 1, 'total': len(docs),
+                                  'created': len(docs), 'failures': []})
+
+    async def create(self, request):
+        await self.delay()
+        index = request.match_info['index']
+        if index in self.mappings:
+            return web.json_response({'error': {
+                'type': 'resource_already_exists_exception'}}, status=400)
+        body = await request.json() if request.can_read_body else {}
+        self.mappings[index] = body.get('mappings', {})
+        self.indices.setdefault(index, {})
+        return web.json_response({'acknowledged': True, 'index': index})
+
+    async def settings(self, request):
+        await self.delay()
+        self.settings_updates.append(await request.json())
+        return web.json_response({'acknowledged': True})
+
+    async def refresh(self, request):
+        await self.delay()
+        self.refreshes += 1
+        return web.json_response({'_shards': {'failed': 0}})
+
+    def store(self, index, doc_id, source):
+        if doc_id is None:
+            self.counter += 1
+            doc_id = str(self.counter)
+        self.indices.setdefault(self.resolve(index), {})[doc_id] = source
+        return doc_id
+
+    async def bulk(self, request):
+        await self.delay()
+        lines = (await request.text()).splitlines()
+        items = []
+        errors = False
+        for action, source in zip(lines[::2], lines[1::2]):
+            meta = json.loads(action)['index']
+            if self.failed():
+                errors = True
+                items.append({'index': {'status': 429, 'error': {
+                    'type': 'es_rejected_execution_exception'}}})
+                continue
+            index = meta.get('_index', request.match_info.get('index'))
+            doc_id = self.store(index, meta.get('_id'), json.loads(source))
+            items.append({'index': {'_id': doc_id, 'status': 201}})
+        return web.json_response({'took': 1, 'errors': errors,
+                                  'items': items})
+
+    async def index(self, request):
+        await self.delay()
+        if self.failed():
+            return web.json_response({'error': 'rejected'}, status=429)
+        doc_id = self.store(request.match_info['index'],
+                            request.match_info.get('id'),
+                            await request.json())
+        return web.json_response({'_id': doc_id, 'result': 'created'},
+                                 status=201)
+
+    async def search(self, request):
+        await self.delay()
+        body = await request.json() if request.can_read_body else {}
+        q = find_query(body.get('query', {})).lower()
+        docs = self.indices.get(self.resolve(request.match_info['index']),
+                                {})
+        hits = [{'_id': doc_id, '_score': 1.0, '_source': source}
+                for doc_id, source in docs.items()
+                if q in source.get('content', '').lower()]
+        total = len(hits)
+        if 'sort' in body:
+            for hit in hits:
+                hit['sort'] = [sort_value(hit, spec) for spec in body['sort']]
+            hits.sort(key=lambda hit: sort_key(hit['sort'], body['sort']))
+        if 'search_after' in body:
+            after = sort_key(body['search_after'], body['sort'])
+            hits = [hit for hit in hits
+                    if sort_key(hit['sort'], body['sort']) > after]
+        start = body.get('from', 0)
+        page = hits[start:start + body.get('size', 10)]
+        if 'highlight' in body:
+            for hit in page:
+                hit['highlight'] = {'content': [
+                    highlight(hit['_source'].get('content', ''), q)]}
+        fields = body.get('_source')
+        if isinstance(fields, list):
+            for hit in page:
+                hit['_source'] = {k: v for k, v in hit['_source'].items()
+                                  if k in fields}
+        return web.json_response({'took': 1, 'timed_out': False, 'hits': {
+            'total': total, 'max_score': 1.0, 'hits': page}})
+
+
+def highlight(content, q, size=150):
+    start = content.lower().find(q)
+    if start < 0:
+        return content[:size]
+    begin = max(0, start - (size - len(q)) // 2)
+    end = start + len(q)
+    return (content[begin:start] + '<em>' + content[start:end] + '</em>' +
+            content[end:begin + size])
+
+
+def sort_order(spec):
+    if isinstance(spec, str):
+        return spec, 'desc' if spec == '_score' else 'asc'
+    return next(iter(spec.items()))
+
+
+def sort_value(hit, spec):
+    field, _ = sort_order(spec)
+    if field == '_score':
+        return hit['_score']
+    return hit['_source'].get(field.split('.')[0])
+
+
+def sort_key(values, specs):
+    return tuple(-value if sort_order(spec)[1] == 'desc' else value
+                 for value, spec in zip(values, specs))
+
+
+def find_query(query):
+    if isinstance(query, dict):
+        for key, value in query.items():
+            if key == 'content':
+                return value['query'] if isinstance(value, dict) else value
+            found = find_query(value)
+            if found:
+                return found
+    elif isinstance(query, list):
+        for value in query:
+            found = find_query(value)
+            if found:
+                return found
+    return ''
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summarize(latencies, errors, elapsed):
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+    }
+    if latencies:
+        for p in (50, 95, 99):
+            result[f'p{p}_ms'] = round(percentile(latencies, p) * 1000, 2)
+    return result
+
+
+# Runs `requests` calls of request(i) spread over `concurrency` clients;
+# request returns whether the call succeeded.
+async def run_profile(request, concurrency, requests):
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            ok = await request(i)
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+from urllib.parse import urlparse
+from aiohttp import ClientSession
+from aioelasticsearch import Elasticsearch
+import api
+import crawler
+import embedded
+from bench.fakes import FakeElasticsearch, make_site_app, start_app
+from bench.load import run_profile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('crawl', 'search', 'login', 'current', 'stat')
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=ROOT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Suite:
+    def __init__(self, session, base, site, args):
+        self.session = session
+        self.base = base
+        self.site = site
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:6]
+        self.users = []
+
+    async def call(self, method, path, params=None, token=None):
+        headers = {'X-Token': token} if token else None
+        async with self.session.request(method, self.base + path,
+                                        params=params,
+                                        headers=headers) as resp:
+            data = await resp.json(content_type=None)
+        return resp.status == 200 and data['status'] == 'ok', data
+
+    async def signup(self):
+        for i in range(self.args.users):
+            user = {'email': f'{self.run_id}{i}@bench.io',
+                    'password': 'bench', 'name': f'{self.run_id}{i}'}
+            ok, data = await self.call('POST', '/signup', user)
+            if not ok:
+                raise RuntimeError(f'signup failed: {data["status"]}')
+            user['token'] = data['data']['token']
+            self.users.append(user)
+
+    def user(self, i):
+        return self.users[i % len(self.users)]
+
+    async def crawl(self):
+        worker = crawler.crawler
+        finished = worker.finished
+        crawled = worker.crawled
+        start = time.perf_counter()
+        for i in range(self.args.domains):
+            await self.call('POST', '/index', {
+                'domain': f'{self.site}/{self.run_id}-{i}',
+                'rps': self.args.rps}, self.user(i)['token'])
+        while worker.finished - finished < self.args.domains:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        pages = worker.crawled - crawled
+        return {'domains': self.args.domains, 'pages': pages,
+                'seconds': round(elapsed, 2),
+                'pages_per_sec': round(pages / elapsed, 1)}
+
+    async def search(self, i):
+        ok, _ = await self.call('GET', '/search', {
+            'q': f'page {i % self.args.pages}', 'limit': 10, 'offset': 0})
+        return ok
+
+    async def login(self, i):
+        user = self.user(i)
+        ok, data = await self.call('POST', '/login', {
+            'email': user['email'], 'password': user['password']})
+        if ok:
+            user['token'] = data['data']['token']
+        return ok
+
+    async def current(self, i):
+        ok, _ = await self.call('GET', '/current',
+                                token=self.user(i)['token'])
+        return ok
+
+    async def stat(self, i):
+        ok, _ = await self.call('GET', '/stat', {'limit': 20},
+                                self.user(i)['token'])
+        return ok
+
+    async def run(self, profile):
+        if profile == 'crawl':
+            return await self.crawl()
+        return await run_profile(getattr(self, profile),
+                                 self.args.concurrency, self.args.requests)
+
+
+async def bench(args):
+    site_runner, site = await start_app(make_site_app(
+        pages=args.pages, links=args.links, delay=args.delay))
+    fake = FakeElasticsearch(latency=args.es_latency)
+    es_runner, es_base = await start_app(fake.app())
+    url = urlparse(es_base)
+    es_hosts = [{'host': url.hostname, 'port': url.port}]
+    api.es = Elasticsearch(hosts=es_hosts)
+    crawler.crawler = crawler.make_crawler(parse_workers=0,
+                                           es_hosts=es_hosts)
+    runner, base = await start_app(embedded.make_app())
+
+    results = {}
+    async with ClientSession() as session:
+        suite = Suite(session, base, site, args)
+        await suite.signup()
+        for profile in args.profiles:
+            results[profile] = await suite.run(profile)
+
+    await runner.cleanup()
+    await api.es.close()
+    await es_runner.cleanup()
+    await site_runner.cleanup()
+    return results
+
+
+def compare(results, baseline):
+    changes = {}
+    for profile, result in results.items():
+        old = baseline['profiles'].get(profile)
+        if not old:
+            continue
+        changes[profile] = {
+            name: round(value / old[name], 3)
+            for name, value in result.items()
+            if isinstance(value, (int, float)) and old.get(name)}
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                        default=list(PROFILES))
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--domains', type=int, default=5)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--links', type=int, default=5)
+    parser.add_argument('--rps', type=float, default=200)
+    parser.add_argument('--delay', type=float, default=0.002,
+                        help='simulated website response time')
+    parser.add_argument('--es-latency', type=float, default=0.002)
+    parser.add_argument('--output', help='write the report to this file')
+    parser.add_argument('--baseline',
+                        help='earlier report to compare against')
+    args = parser.parse_args()
+
+    results = api.loop.run_until_complete(bench(args))
+    report = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'config': {name: value for name, value in vars(args).items()
+                   if name not in ('output', 'baseline')},
+        'profiles': results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['vs_baseline'] = compare(results, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        try:
+            value, expires = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        if expires <= time.monotonic():
+            del self.data[key]
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self.data[key] = (value, time.monotonic() + ttl)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        item = self.data.pop(key, None)
+        return None if item is None else item[0]
+
+    def discard_if(self, predicate):
+        for key in [key for key, (value, _) in self.data.items()
+                    if predicate(key, value)]:
+            del self.data[key]
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'size': len(self.data), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0}
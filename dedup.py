@@ -0,0 +1,180 @@
+import array
+import hashlib
+import math
+from urllib.parse import urlsplit
+
+
+default_ports = {'http': ':80', 'https': ':443'}
+
+
+# Query parameters are sorted as raw pairs rather than decoded and
+# re-encoded: it is several times cheaper and this runs for every link.
+def canonicalize(url):
+    scheme, netloc, path, query, _ = urlsplit(url.strip())
+    userinfo, at, host = netloc.rpartition('@')
+    host = host.lower()
+    port = default_ports.get(scheme)
+    if port is not None and host.endswith(port):
+        host = host[:-len(port)]
+    if host.endswith('.'):
+        host = host.rstrip('.')
+    if '&' in query:
+        query = '&'.join(sorted(pair for pair in query.split('&') if pair))
+    url = f'{scheme}://{userinfo}{at}{host}{path or "/"}'
+    return f'{url}?{query}' if query else url
+
+
+# Zero marks an empty slot in FingerprintSet, so it is never handed out.
+def fingerprint(url):
+    digest = hashlib.blake2b(canonicalize(url).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little') or 1
+
+
+class FingerprintSet:
+    def __init__(self, capacity=1024, max_load=0.7):
+        size = 8
+        while size * max_load < capacity:
+            size *= 2
+        self.max_load = max_load
+        self.slots = array.array('Q', bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, fp):
+        slots = self.slots
+        mask = self.mask
+        index = fp & mask
+        while True:
+            value = slots[index]
+            if value == fp:
+                return True
+            if value == 0:
+                return False
+            index = (index + 1) & mask
+
+    def add(self, fp):
+        slots = self.slots
+        mask = self.mask
+        index = fp & mask
+        while True:
+            value = slots[index]
+            if value == fp:
+                return False
+            if value == 0:
+                break
+            index = (index + 1) & mask
+        slots[index] = fp
+        self.count += 1
+        if self.count > len(slots) * self.max_load:
+            self.grow()
+        return True
+
+    def grow(self):
+        old = self.slots
+        self.slots = array.array('Q', bytes(16 * len(old)))
+        self.mask = len(self.slots) - 1
+        self.count = 0
+        for fp in old:
+            if fp:
+                self.add(fp)
+
+    def nbytes(self):
+        return self.slots.itemsize * len(self.slots)
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.bits = bytearray((bits + 7) // 8)
+        self.size = len(self.bits) * 8
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+
+    def positions(self, fp):
+        low, high = fp & 0xffffffff, fp >> 32 | 1
+        return [(low + i * high) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, fp):
+        bits = self.bits
+        return all(bits[pos >> 3] & 1 << (pos & 7)
+                   for pos in self.positions(fp))
+
+    def add(self, fp):
+        for pos in self.positions(fp):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def nbytes(self):
+        return len(self.bits)
+
+
+# Each new filter doubles the capacity and tightens the error rate so the
+# compound false positive rate stays bounded. Once another filter would
+# exceed max_bytes the last one keeps absorbing entries: memory stays
+# fixed and the false positive rate rises instead.
+class ScalableBloomFilter:
+    def __init__(self, capacity=1024, error_rate=0.001, max_bytes=None,
+                 growth=2, tightening=0.9):
+        self.error_rate = error_rate * (1 - tightening)
+        self.max_bytes = max_bytes
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = [BloomFilter(capacity, self.error_rate)]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, fp):
+        return any(fp in bloom for bloom in reversed(self.filters))
+
+    def add(self, fp):
+        if fp in self:
+            return False
+        bloom = self.filters[-1]
+        if bloom.count >= bloom.capacity:
+            capacity = bloom.capacity * self.growth
+            error_rate = self.error_rate * self.tightening ** len(
+                self.filters)
+            bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+            if self.max_bytes is None or \
+                    self.nbytes() + bits / 8 <= self.max_bytes:
+                bloom = BloomFilter(capacity, error_rate)
+                self.filters.append(bloom)
+        bloom.add(fp)
+        self.count += 1
+        return True
+
+    def nbytes(self):
+        return sum(bloom.nbytes() for bloom in self.filters)
+
+
+class SeenUrls:
+    def __init__(self, mode='exact', capacity=1024, error_rate=0.001,
+                 max_bytes=None):
+        if mode == 'exact':
+            self.fingerprints = FingerprintSet(capacity)
+        elif mode == 'bloom':
+            self.fingerprints = ScalableBloomFilter(capacity, error_rate,
+                                                    max_bytes)
+        else:
+            raise ValueError(f'unknown dedup mode {mode}')
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, url):
+        return fingerprint(url) in self.fingerprints
+
+    def add(self, url):
+        return self.fingerprints.add(fingerprint(url))
+
+    def add_fingerprint(self, fp):
+        return self.fingerprints.add(fp)
+
+    def nbytes(self):
+        return self.fingerprints.nbytes()
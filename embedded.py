@@ -0,0 +1,48 @@
+from aiohttp import web
+import api
+import auth
+import crawler
+from orm import User, Token, Stat, Page
+from transport import MemoryTransport
+
+
+async def on_startup(app):
+    await User.objects.migrate()
+    await Token.objects.migrate()
+    await Stat.objects.migrate()
+    await Page.objects.migrate()
+    app['auth_worker'] = auth.AuthWorker(app['transport'])
+    await app['auth_worker'].start()
+    if crawler.crawler is None:
+        crawler.crawler = crawler.make_crawler()
+    await crawler.prepare_index(crawler.crawler.es_hosts)
+    await crawler.crawler.crawl(app['transport'])
+    await crawler.crawler.resume()
+    app['crawler_consumer'] = await crawler.consumer(app['transport'])
+
+
+async def on_cleanup(app):
+    await app['crawler_consumer'].cancel()
+    await app['auth_worker'].stop()
+    await crawler.crawler.close()
+
+
+# Runs the API, the auth service and the crawler in one process, talking
+# over an in-memory transport instead of RabbitMQ.
+def make_app(transport=None):
+    transport = transport or MemoryTransport(loop=api.loop)
+    api.auth_ms = api.AuthMS(transport)
+    api.crawler_ms = api.CrawlerMS(transport)
+    app = api.make_app()
+    app['transport'] = transport
+    app.on_startup.append(on_startup)
+    app.on_cleanup.insert(0, on_cleanup)
+    return app
+
+
+def main():
+    web.run_app(make_app())
+
+
+if __name__ == '__main__':
+    main()
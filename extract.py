@@ -0,0 +1,106 @@
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+SKIP_TAGS = {'title', 'script', 'style', 'noscript'}
+# Only these break words apart; inline tags such as <b> or <a> join their
+# text with the neighbouring text, as the markup stripping did before.
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'caption',
+    'dd', 'details', 'dialog', 'div', 'dl', 'dt', 'fieldset', 'figcaption',
+    'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head',
+    'header', 'hr', 'html', 'li', 'main', 'nav', 'ol', 'option', 'p', 'pre',
+    'section', 'summary', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead',
+    'tr', 'ul',
+}
+
+
+class Collector:
+    def __init__(self):
+        self.text = []
+        self.hrefs = []
+        self.skip = 0
+
+    def start(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        elif tag == 'a':
+            href = attrs.get('href')
+            if href:
+                self.hrefs.append(href)
+
+    def end(self, tag):
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag in SKIP_TAGS and self.skip:
+            self.skip -= 1
+
+    def data(self, data):
+        if not self.skip:
+            self.text.append(data)
+
+    def close(self):
+        return ' '.join(''.join(self.text).split()), self.hrefs
+
+
+class StdlibParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.collector = Collector()
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def parse_stdlib(html):
+    parser = StdlibParser()
+    parser.feed(html)
+    parser.close()
+    return parser.collector.close()
+
+
+def parse_lxml(html):
+    parser = etree.HTMLParser(target=Collector(), encoding='utf-8')
+    parser.feed(html.encode('utf-8'))
+    return parser.close()
+
+
+def normalize_link(href, root):
+    if '#' in href:
+        href = href.split('#', 1)[0]
+    if '../' in href:
+        href = href.split('../', 1)[1]
+    if not href:
+        return None
+    if root in href:
+        return href
+    if 'https://' in href or 'http://' in href or ':' in href.split('/')[0]:
+        return None
+    return f'{root}/{href.lstrip("/")}'
+
+
+def extract(html, root, backend=None):
+    if backend is None:
+        backend = 'lxml' if etree is not None else 'html.parser'
+    if backend == 'lxml':
+        text, hrefs = parse_lxml(html)
+    else:
+        text, hrefs = parse_stdlib(html)
+    links = set()
+    for href in hrefs:
+        link = normalize_link(href, root)
+        if link is not None:
+            links.add(link)
+    return text, links
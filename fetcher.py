@@ -0,0 +1,83 @@
+import asyncio
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+try:
+    from aiohttp.resolver import AsyncResolver
+    import aiodns
+except ImportError:
+    aiodns = None
+
+
+html_types = ('text/html', 'application/xhtml+xml')
+
+
+class FetchResult:
+    def __init__(self, status, headers, outcome, body=None):
+        self.status = status
+        self.headers = headers
+        self.outcome = outcome
+        self.body = body
+
+
+class Fetcher:
+    def __init__(self, limit=100, limit_per_host=4, keepalive_timeout=30,
+                 dns_cache_ttl=300, connect_timeout=5, read_timeout=15,
+                 total_timeout=60, max_bytes=5 * 2 ** 20,
+                 content_types=html_types, chunk_size=2 ** 16, loop=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = ClientTimeout(total=total_timeout,
+                                     sock_connect=connect_timeout,
+                                     sock_read=read_timeout)
+        self.max_bytes = max_bytes
+        self.content_types = content_types
+        self.chunk_size = chunk_size
+        self.loop = loop or asyncio.get_event_loop()
+        self.session = None
+
+    async def start(self):
+        resolver = AsyncResolver(loop=self.loop) if aiodns else None
+        connector = TCPConnector(limit=self.limit,
+                                 limit_per_host=self.limit_per_host,
+                                 keepalive_timeout=self.keepalive_timeout,
+                                 use_dns_cache=True,
+                                 ttl_dns_cache=self.dns_cache_ttl,
+                                 resolver=resolver, loop=self.loop)
+        self.session = ClientSession(connector=connector,
+                                     timeout=self.timeout, loop=self.loop)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    # The decision to skip a response is made from its headers, and the
+    # body is streamed so an oversized page is dropped after max_bytes
+    # rather than read into memory whole.
+    async def get(self, url, headers=None):
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return FetchResult(304, response.headers, 'not_modified')
+            if response.status >= 300:
+                return FetchResult(response.status, response.headers,
+                                   'failed')
+            if response.content_type not in self.content_types:
+                return FetchResult(response.status, response.headers,
+                                   'skipped')
+            length = response.content_length
+            if length is not None and length > self.max_bytes:
+                return FetchResult(response.status, response.headers,
+                                   'oversized')
+            chunks = []
+            size = 0
+            async for chunk in response.content.iter_chunked(
+                    self.chunk_size):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    return FetchResult(response.status, response.headers,
+                                       'oversized')
+                chunks.append(chunk)
+            return FetchResult(response.status, response.headers, 'ok',
+                               b''.join(chunks))
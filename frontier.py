@@ -0,0 +1,100 @@
+import os
+import sqlite3
+from collections import deque
+from dedup import SeenUrls, fingerprint
+
+
+def to_signed(fp):
+    return fp - 2 ** 64 if fp >= 2 ** 63 else fp
+
+
+# A per-domain crawl frontier kept in SQLite. It quacks like the deque
+# DomainScheduler expects (append, popleft, len) and like SeenUrls (add),
+# holding at most `memory` entries read ahead and `batch` entries not yet
+# written. sync() commits new links together with the removal of pages
+# reported done(), so after a crash every page is either still pending or
+# has its links on disk.
+class Frontier:
+    def __init__(self, path, seen=None, memory=1000, batch=500):
+        self.path = path
+        self.seen = seen or SeenUrls()
+        self.memory = memory
+        self.batch = batch
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS pending '
+                        '(id INTEGER PRIMARY KEY, url TEXT, depth INTEGER)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS seen '
+                        '(fp INTEGER PRIMARY KEY)')
+        for fp, in self.db.execute('SELECT fp FROM seen'):
+            self.seen.add_fingerprint(fp % 2 ** 64)
+        self.on_disk, = self.db.execute(
+            'SELECT COUNT(*) FROM pending').fetchone()
+        self.head = deque()
+        self.tail = []
+        self.new_seen = []
+        self.last_read = 0
+        self.popped = 0
+        self.in_flight = {}
+
+    def __len__(self):
+        return len(self.head) + self.on_disk + len(self.tail)
+
+    def add(self, url):
+        fp = fingerprint(url)
+        if not self.seen.add_fingerprint(fp):
+            return False
+        self.new_seen.append((to_signed(fp),))
+        return True
+
+    def append(self, item):
+        self.tail.append(item)
+        if len(self.tail) >= self.batch:
+            self.write_tail()
+
+    def popleft(self):
+        if not self.head:
+            self.read_ahead()
+        row_id, url, depth = self.head.popleft()
+        self.popped = row_id
+        self.in_flight[url] = row_id
+        return url, depth
+
+    def done(self, url):
+        self.in_flight.pop(url, None)
+
+    def write_tail(self):
+        self.db.executemany('INSERT INTO pending (url, depth) VALUES (?, ?)',
+                            self.tail)
+        self.on_disk += len(self.tail)
+        self.tail = []
+
+    def read_ahead(self):
+        if not self.on_disk:
+            self.write_tail()
+        rows = self.db.execute(
+            'SELECT id, url, depth FROM pending WHERE id > ? '
+            'ORDER BY id LIMIT ?', (self.last_read, self.memory)).fetchall()
+        self.head.extend(rows)
+        self.on_disk -= len(rows)
+        if rows:
+            self.last_read = rows[-1][0]
+
+    def sync(self):
+        self.write_tail()
+        self.db.executemany('INSERT OR IGNORE INTO seen (fp) VALUES (?)',
+                            self.new_seen)
+        self.new_seen = []
+        done = min(self.in_flight.values(), default=self.popped + 1)
+        self.db.execute('DELETE FROM pending WHERE id < ?', (done,))
+        self.db.commit()
+
+    def close(self, remove=False):
+        if not remove:
+            self.sync()
+        self.db.close()
+        if remove:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
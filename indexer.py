@@ -0,0 +1,201 @@
+import asyncio
+import json
+import metrics
+from elasticsearch import TransportError
+
+
+es_seconds = metrics.histogram('indexer_es_seconds',
+                               'Elasticsearch request latency from the '
+                               'bulk indexer', ['operation'])
+indexed = metrics.counter('indexer_documents_total',
+                          'Documents sent to Elasticsearch', ['result'])
+# 'N/A' is what the client reports when it could not connect at all.
+retry_statuses = (429, 500, 502, 503, 504, 'N/A')
+
+
+# `alias` points at the versioned index `{alias}_v{version}`, so a mapping
+# change ships as a new version: the new index is created, documents are
+# copied into it with _reindex, and one _aliases call drops the old index
+# and moves the alias. A concrete index created under the alias's name
+# before indexes were versioned is migrated the same way. This runs once,
+# before any process writing to the index starts.
+async def migrate_index(es, alias, body, version):
+    name = f'{alias}_v{version}'
+    try:
+        await es.indices.create(index=name, body=body)
+    except TransportError as err:
+        if err.error != 'resource_already_exists_exception':
+            raise
+    if await es.indices.exists_alias(name=alias):
+        old = set(await es.indices.get_alias(name=alias)) - {name}
+        if not old:
+            return
+    elif await es.indices.exists(index=alias):
+        old = {alias}
+    else:
+        old = set()
+    for index in old:
+        await es.reindex(body={'source': {'index': index},
+                               'dest': {'index': name}},
+                         wait_for_completion=True, request_timeout=3600)
+    actions = [{'remove_index': {'index': index}} for index in old]
+    actions.append({'add': {'index': name, 'alias': alias}})
+    await es.indices.update_aliases(body={'actions': actions})
+
+
+async def ensure_index(es, alias):
+    if not await es.indices.exists_alias(name=alias):
+        raise ValueError(f'index {alias} does not exist, run '
+                         f'migrate_index() first')
+
+
+# An interval of None turns periodic refreshes off.
+async def put_refresh_interval(es, index, interval):
+    value = '-1' if interval is None else f'{interval}s'
+    await es.indices.put_settings(index=index, body={
+        'index': {'refresh_interval': value}})
+
+
+class BulkIndexer:
+    def __init__(self, es, index, max_docs=500, max_bytes=5 * 2 ** 20,
+                 flush_interval=1, max_pending=4, retries=3, backoff=0.5,
+                 refresh_interval=1, on_refresh=None, loop=None):
+        self.es = es
+        self.index = index
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.refresh_interval = refresh_interval
+        self.on_refresh = on_refresh
+        self.refresh_timer = None
+        self.refreshing = None
+        self.loop = loop or asyncio.get_event_loop()
+        self.slots = asyncio.Semaphore(max_pending)
+        self.buffer = []
+        self.size = 0
+        self.timer = None
+        self.pending = set()
+
+    async def add(self, doc, doc_id=None):
+        action = {'_index': self.index}
+        if doc_id is not None:
+            action['_id'] = doc_id
+        lines = json.dumps({'index': action}) + '\n' + json.dumps(doc) + '\n'
+        self.buffer.append(lines)
+        self.size += len(lines)
+        if len(self.buffer) >= self.max_docs or self.size >= self.max_bytes:
+            await self.flush()
+        elif self.timer is None:
+            self.timer = self.loop.call_later(self.flush_interval,
+                                              self.flush_later)
+
+    def flush_later(self):
+        self.timer = None
+        self.loop.create_task(self.flush())
+
+    # Waiting for a free slot here is the backpressure: when max_pending
+    # bulk requests are already in flight the worker calling add() blocks
+    # until Elasticsearch catches up.
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.buffer:
+            return
+        batch, self.buffer, self.size = self.buffer, [], 0
+        await self.slots.acquire()
+        task = self.loop.create_task(self.send(batch))
+        self.pending.add(task)
+        task.add_done_callback(self.sent)
+
+    def sent(self, task):
+        self.pending.discard(task)
+        self.slots.release()
+
+    # Whatever is left to retry goes out again as one smaller _bulk
+    # request, so a batch holds its slot for at most `retries` backoffs
+    # however many documents were rejected.
+    async def send(self, batch):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                indexed.inc(len(batch), 'retried')
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            batch = await self.post(batch)
+            if not batch:
+                return
+        indexed.inc(len(batch), 'dropped')
+        print(f'dropped {len(batch)} documents')
+
+    # Returns the documents worth sending again: the whole batch when the
+    # request itself failed, otherwise those rejected with a retryable
+    # status.
+    async def post(self, batch):
+        body = ''.join(batch)
+        try:
+            with es_seconds.time('bulk'):
+                resp = await self.es.bulk(body=body)
+        except (TransportError, asyncio.TimeoutError) as err:
+            print(err)
+            if getattr(err, 'status_code', 500) in retry_statuses:
+                return batch
+            indexed.inc(len(batch), 'dropped')
+            return []
+        failed = []
+        ok = len(batch)
+        if resp.get('errors'):
+            for item, entry in zip(resp['items'], batch):
+                status = item['index'].get('status', 500)
+                if status < 300:
+                    continue
+                ok -= 1
+                if status in retry_statuses:
+                    failed.append(entry)
+                else:
+                    indexed.inc(1, 'dropped')
+                    print(item['index'].get('error'))
+        indexed.inc(ok, 'ok')
+        if ok:
+            self.schedule_refresh()
+        return failed
+
+    # Documents become searchable on the next periodic refresh of the
+    # index, so on_refresh fires once per refresh_interval after writes
+    # rather than once per bulk request.
+    def schedule_refresh(self):
+        if self.on_refresh is not None and self.refresh_timer is None and \
+                self.refreshing:
+            self.refresh_timer = self.loop.call_later(self.refresh_interval,
+                                                      self.refreshed)
+
+    def refreshed(self):
+        self.refresh_timer = None
+        self.on_refresh()
+
+    async def drain(self):
+        await self.flush()
+        if self.pending:
+            await asyncio.gather(*self.pending)
+
+    # Periodic refreshes are wasted work while a bulk crawl is writing;
+    # with them off, documents become visible on the explicit refresh().
+    async def set_refresh(self, enabled):
+        if enabled == self.refreshing:
+            return
+        await put_refresh_interval(
+            self.es, self.index, self.refresh_interval if enabled else None)
+        self.refreshing = enabled
+
+    async def refresh(self):
+        await self.drain()
+        with es_seconds.time('refresh'):
+            await self.es.indices.refresh(index=self.index)
+        if self.on_refresh is not None:
+            self.on_refresh()
+
+    async def close(self):
+        await self.drain()
+        if self.refresh_timer is not None:
+            self.refresh_timer.cancel()
+            self.refresh_timer = None
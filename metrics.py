@@ -0,0 +1,221 @@
+import bisect
+import functools
+import time
+from aiohttp import web
+
+
+enabled = True
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+null_timer = NullTimer()
+
+
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.children = {}
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.child()
+        return child
+
+    def samples(self):
+        if not self.label_names:
+            yield from self.child_samples(self, '')
+            return
+        for values, child in self.children.items():
+            labels = ','.join(f'{name}="{value}"' for name, value
+                              in zip(self.label_names, values))
+            yield from self.child_samples(child, labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}',
+                 f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, value in self.samples():
+            labels = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}{suffix}{labels} {value}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.value = 0
+
+    def child(self):
+        return Counter(self.name, self.help)
+
+    def inc(self, value=1, *labels):
+        if not enabled:
+            return
+        target = self.labels(*labels) if labels else self
+        target.value += value
+
+    def child_samples(self, child, labels):
+        yield '', labels, child.value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=(), callback=None):
+        super().__init__(name, help, labels)
+        self.value = 0
+        self.callback = callback
+
+    def child(self):
+        return Gauge(self.name, self.help)
+
+    def set(self, value, *labels):
+        if not enabled:
+            return
+        target = self.labels(*labels) if labels else self
+        target.value = value
+
+    def inc(self, value=1, *labels):
+        if not enabled:
+            return
+        target = self.labels(*labels) if labels else self
+        target.value += value
+
+    def dec(self, value=1, *labels):
+        self.inc(-value, *labels)
+
+    def child_samples(self, child, labels):
+        value = child.value if child.callback is None else child.callback()
+        yield '', labels, value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+    buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+               2.5, 5, 10)
+
+    def __init__(self, name, help, labels=(), buckets=None):
+        super().__init__(name, help, labels)
+        if buckets is not None:
+            self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def child(self):
+        return Histogram(self.name, self.help, buckets=self.buckets)
+
+    def observe(self, value, *labels):
+        if not enabled:
+            return
+        target = self.labels(*labels) if labels else self
+        target.counts[bisect.bisect_left(target.buckets, value)] += 1
+        target.sum += value
+        target.count += 1
+
+    # Disabled metrics hand out a shared no-op context manager, so a
+    # timed block costs one flag check and nothing else.
+    def time(self, *labels):
+        if not enabled:
+            return null_timer
+        return Timer(self.labels(*labels) if labels else self)
+
+    def child_samples(self, child, labels):
+        prefix = f'{labels},' if labels else ''
+        total = 0
+        for bound, count in zip(child.buckets, child.counts):
+            total += count
+            yield '_bucket', f'{prefix}le="{bound}"', total
+        yield '_bucket', f'{prefix}le="+Inf"', child.count
+        yield '_sum', labels, round(child.sum, 6)
+        yield '_count', labels, child.count
+
+
+def timed(histogram, *labels):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not enabled:
+                return await func(*args, **kwargs)
+            with histogram.time(*labels):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'metric {metric.name} already registered')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render()
+                         for metric in self.metrics.values()) + '\n'
+
+
+registry = Registry()
+
+
+def counter(name, help, labels=()):
+    return registry.register(Counter(name, help, labels))
+
+
+def gauge(name, help, labels=(), callback=None):
+    return registry.register(Gauge(name, help, labels, callback))
+
+
+def histogram(name, help, labels=(), buckets=None):
+    return registry.register(Histogram(name, help, labels, buckets))
+
+
+async def handler(request):
+    return web.Response(text=registry.render(), content_type='text/plain')
+
+
+async def serve(port, host='0.0.0.0'):
+    app = web.Application()
+    app.add_routes([web.get('/metrics', handler)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
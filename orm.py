@@ -1,19 +1,110 @@
 import asyncio
+import datetime
 import aiomysql
+import metrics
 from aiomysql import Error
+from operator import attrgetter
 
 
 loop = asyncio.get_event_loop()
+db_config = {'user': 'root', 'db': 'crawler'}
+pool_minsize = 1
+pool_maxsize = 10
+pool = None
+pool_lock = asyncio.Lock()
+query_seconds = metrics.histogram('orm_query_seconds',
+                                  'Time spent executing SQL statements',
+                                  ['statement'])
+
+
+def configure(minsize=None, maxsize=None, **kwargs):
+    global pool_minsize, pool_maxsize
+    if minsize is not None:
+        pool_minsize = minsize
+    if maxsize is not None:
+        pool_maxsize = maxsize
+    db_config.update(kwargs)
 
 
 async def connect():
     try:
-        conn = await aiomysql.connect(user='root', db='crawler', loop=loop)
+        conn = await aiomysql.connect(loop=loop, **db_config)
     except aiomysql.Error as err:
         print(err)
     return conn
 
 
+async def get_pool():
+    global pool
+    if pool is None:
+        async with pool_lock:
+            if pool is None:
+                pool = await aiomysql.create_pool(
+                    minsize=pool_minsize, maxsize=pool_maxsize,
+                    autocommit=True, loop=loop, **db_config)
+    return pool
+
+
+async def close():
+    global pool
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+        pool = None
+
+
+async def execute(conn, query, args=(), fetch=False):
+    cursor = await conn.cursor()
+    try:
+        with query_seconds.time(query.split(None, 1)[0].upper()):
+            await cursor.execute(query, args)
+        if fetch:
+            field_names = [column[0] for column in cursor.description]
+            return field_names, await cursor.fetchall()
+        return cursor.lastrowid
+    except aiomysql.Error as err:
+        raise ValueError(str(err.args[-1]))
+    finally:
+        await cursor.close()
+
+
+class Acquire:
+    def __init__(self, conn=None):
+        self.conn = conn
+        self.pool = None
+
+    async def __aenter__(self):
+        if self.conn is None:
+            self.pool = await get_pool()
+            self.conn = await self.pool.acquire()
+        return self.conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.pool is not None:
+            self.pool.release(self.conn)
+            self.conn = None
+
+
+class Transaction(Acquire):
+    async def __aenter__(self):
+        conn = await super().__aenter__()
+        await conn.begin()
+        return conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self.conn.commit()
+            else:
+                await self.conn.rollback()
+        finally:
+            await super().__aexit__(exc_type, exc, tb)
+
+
+def transaction():
+    return Transaction()
+
+
 class Field:
     def __init__(self, f_type, required=True, default=None):
         self.f_type = f_type
@@ -30,13 +121,31 @@ class Field:
                 raise ValueError('field value is none but required')
         return self.f_type(value)
 
+    def compile(self):
+        f_type = self.f_type
+        required = self.required
+        default = None if self.default is None else f_type(self.default)
+
+        def validate(value):
+            if value is None:
+                if default is not None:
+                    return default
+                if required:
+                    raise ValueError('field value is none but required')
+                return None
+            if type(value) is f_type:
+                return value
+            return f_type(value)
+        return validate
+
 
 class IntField(Field):
     def __init__(self, required=True, default=None,
-                 pri_key=False, auto_inc=False, bool=False):
+                 pri_key=False, auto_inc=False, bool=False, big=False):
         self.pri_key = pri_key
         self.auto_inc = auto_inc
         self.bool = bool
+        self.big = big
         super().__init__(int, required, default)
 
     def validate(self, value):
@@ -44,9 +153,17 @@ class IntField(Field):
             return None
         return super().validate(value)
 
+    def compile(self):
+        validate = super().compile()
+        if not self.pri_key:
+            return validate
+        return lambda value: None if value is None else validate(value)
+
     def column_type(self):
         if self.bool:
             col_type = ['INT(1)']
+        elif self.big:
+            col_type = ['BIGINT']
         else:
             col_type = ['INT']
         if self.required:
@@ -60,16 +177,39 @@ class IntField(Field):
         return ' '.join(col_type)
 
 
+class FloatField(Field):
+    def __init__(self, required=True, default=None):
+        super().__init__(float, required, default)
+
+    def column_type(self):
+        col_type = ['DOUBLE']
+        if self.required:
+            col_type.append('NOT NULL')
+        if self.default is not None:
+            col_type.append(f'DEFAULT {self.default}')
+        return ' '.join(col_type)
+
+
 class StringField(Field):
     def __init__(self, size, required=True, default=None):
         self.size = size
         super().__init__(str, required, default)
 
     def validate(self, value):
-        if len(value) > self.size:
+        if value is not None and len(value) > self.size:
             raise ValueError('incorrrect str size')
         return super().validate(value)
 
+    def compile(self):
+        validate = super().compile()
+        size = self.size
+
+        def validate_size(value):
+            if value is not None and len(value) > size:
+                raise ValueError('incorrrect str size')
+            return validate(value)
+        return validate_size
+
     def column_type(self):
         col_type = [f'VARCHAR({self.size})']
         if self.required:
@@ -79,6 +219,11 @@ class StringField(Field):
         return ' '.join(col_type)
 
 
+# Current local time in the format DatetimeField columns are written with.
+def now():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
 class DatetimeField(Field):
     def __init__(self, required=True, default=None):
         super().__init__(str, required, default)
@@ -103,18 +248,75 @@ class ModelMeta(type):
         if not hasattr(meta, 'table_name'):
             raise ValueError('table_name is empty')
 
+        fields = {}
         for base in bases:
             if hasattr(base, '_fields'):
-                for k, v in base._fields.items():
-                    namespace[k] = v
-
-        fields = {k: v for k, v in namespace.items()
-                  if isinstance(v, Field)}
+                fields.update(base._fields)
+        inherited = set(fields)
+        for k, v in list(namespace.items()):
+            if isinstance(v, Field):
+                fields[k] = namespace.pop(k)
+
+        # Fields live in slots rather than a per-instance __dict__, and
+        # __init__ is generated with each field's validator compiled once.
+        namespace['__slots__'] = tuple(k for k in fields
+                                       if k not in inherited)
+        namespace['__init__'] = make_init(fields)
+        if len(fields) == 1:
+            getter = attrgetter(*fields)
+            namespace['_getter'] = staticmethod(
+                lambda model: (getter(model),))
+        else:
+            namespace['_getter'] = attrgetter(*fields)
         namespace['_fields'] = fields
         namespace['_table_name'] = meta.table_name
+        namespace['_indexes'] = make_indexes(meta, fields)
+        namespace['_pri_key'] = next((k for k, v in fields.items()
+                                      if getattr(v, 'pri_key', False)), None)
         return super().__new__(mcs, name, bases, namespace)
 
 
+def make_indexes(meta, fields):
+    indexes = []
+    for attr, unique in (('indexes', False), ('unique', True)):
+        for columns in getattr(meta, attr, ()):
+            if isinstance(columns, str):
+                columns = (columns,)
+            for column in columns:
+                if column not in fields:
+                    raise ValueError(f'unknown index column {column}')
+            prefix = 'uq' if unique else 'idx'
+            indexes.append((f'{prefix}_{"_".join(columns)}', tuple(columns),
+                            unique))
+    return indexes
+
+
+def index_definition(name, columns, unique):
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    return f'{kind} {name} ({", ".join(columns)})'
+
+
+def make_init(fields):
+    params = ['self']
+    if fields:
+        params.append('*')
+        params.extend(f'{name}=None' for name in fields)
+    params.append('**kwargs')
+    lines = [f'    self.{name} = validate_{name}({name})' for name in fields]
+    lines.append('    self._orig = None')
+    lines.append('    self._partial = False')
+    source = f'def __init__({", ".join(params)}):\n' + '\n'.join(lines)
+    namespace = {f'validate_{name}': field.compile()
+                 for name, field in fields.items()}
+    exec(source, namespace)
+    return namespace['__init__']
+
+
+# Stands in for the stored value of a column whose database value is not
+# known, so changed() keeps reporting it.
+unsaved = object()
+
+
 class DoesNotExist(Exception):
     def __init__(self, message, errors=None):
         super().__init__(f'{message} does not exist')
@@ -122,29 +324,99 @@ class DoesNotExist(Exception):
 
 
 class Manage:
-    def __init__(self):
-        self.model_cls = None
-        self.conn = loop.run_until_complete(connect())
-
-    def __del__(self):
-        self.conn.close()
+    def __init__(self, model_cls=None, conn=None, columns=None,
+                 mode='model'):
+        self.model_cls = model_cls
+        self.conn = conn
+        self.columns = columns
+        self.mode = mode
 
     def __get__(self, instance, owner):
-        self.model_cls = owner
-        return self
+        return Manage(owner, self.conn)
+
+    def using(self, conn):
+        return Manage(self.model_cls, conn, self.columns, self.mode)
+
+    def project(self, columns, mode):
+        for column in columns:
+            if column not in self.model_cls._fields:
+                raise ValueError(f'unknown column {column}')
+        return Manage(self.model_cls, self.conn, columns or None, mode)
+
+    def only(self, *columns):
+        return self.project(columns, 'model')
+
+    def values(self, *columns):
+        return self.project(columns, 'dict')
+
+    def values_list(self, *columns):
+        return self.project(columns, 'tuple')
 
     async def create_table(self):
         columns = []
         for name, field in self.model_cls._fields.items():
             columns.append(f'{name} {field.column_type()}')
+        for index in self.model_cls._indexes:
+            columns.append(index_definition(*index))
         query = f'CREATE TABLE {self.model_cls._table_name} ' \
                 f'({", ".join(columns)})'
-        cursor = await self.conn.cursor()
-        try:
-            await cursor.execute(query)
-        except aiomysql.Error as err:
-            print(err)
-        await cursor.close()
+        async with Acquire(self.conn) as conn:
+            try:
+                await execute(conn, query)
+            except ValueError as err:
+                print(err)
+
+    async def migrate(self):
+        table = self.model_cls._table_name
+        async with Acquire(self.conn) as conn:
+            _, rows = await execute(conn, 'SHOW TABLES LIKE %s', (table,),
+                                    fetch=True)
+            if not rows:
+                await self.using(conn).create_table()
+                return
+            _, rows = await execute(conn, f'SHOW COLUMNS FROM {table}',
+                                    fetch=True)
+            columns = {row[0] for row in rows}
+            for name, field in self.model_cls._fields.items():
+                if name in columns:
+                    continue
+                try:
+                    await execute(conn, f'ALTER TABLE {table} '
+                                        f'ADD {name} {field.column_type()}')
+                except ValueError as err:
+                    print(err)
+            field_names, rows = await execute(conn,
+                                              f'SHOW INDEX FROM {table}',
+                                              fetch=True)
+            key_name = field_names.index('Key_name')
+            existing = {row[key_name] for row in rows}
+            for index in self.model_cls._indexes:
+                name, _, unique = index
+                if name in existing:
+                    continue
+                try:
+                    await execute(conn, f'ALTER TABLE {table} '
+                                        f'ADD {index_definition(*index)}')
+                except ValueError as err:
+                    # Upserts rely on unique keys, so rows that already
+                    # break one have to be cleaned up before going on.
+                    if unique:
+                        raise ValueError(f'cannot add {name} to {table}: '
+                                         f'{err}')
+                    print(err)
+
+    async def raw(self, query, values=()):
+        async with Acquire(self.conn) as conn:
+            field_names, rows = await execute(conn, query, values,
+                                              fetch=True)
+        return [dict(zip(field_names, row)) for row in rows]
+
+    async def explain(self, **kwargs):
+        query, values = self.select(**kwargs)
+        async with Acquire(self.conn) as conn:
+            field_names, rows = await execute(conn, f'EXPLAIN {query}',
+                                              values, fetch=True)
+        return [dict(zip(field_names, row)) for row in rows]
 
     async def create(self, **kwargs):
         columns = []
@@ -157,23 +429,163 @@ class Manage:
                 values_list.append(value)
         query = f'INSERT INTO {self.model_cls._table_name} ' \
                 f'({", ".join(columns)}) VALUES ({", ".join(values_str)})'
-        cursor = await self.conn.cursor()
-        try:
-            await cursor.execute(query, tuple(values_list))
-        except aiomysql.Error as err:
-            await cursor.close()
-            raise ValueError(str(err.args[1]))
-        await cursor.close()
-
-        if 'id' in self.model_cls.__dict__ and 'id' not in kwargs:
-            cursor = await self.conn.cursor()
-            await cursor.execute('SELECT LAST_INSERT_ID()')
-            field_names = [column[0] for column in cursor.description]
-            for tuple_arg in await cursor.fetchall():
-                kwargs['id'] = tuple_arg[0]
-        await cursor.close()
-        await self.conn.commit()
-        return self.model_cls(**kwargs)
+        async with Acquire(self.conn) as conn:
+            row_id = await execute(conn, query, tuple(values_list))
+        pri_key = self.model_cls._pri_key
+        if pri_key is not None and kwargs.get(pri_key) is None:
+            kwargs[pri_key] = row_id
+        model = self.model_cls(**kwargs)
+        model.mark_saved()
+        return model
+
+    def insert_columns(self, models):
+        pri_key = self.model_cls._pri_key
+        return [name for name in self.model_cls._fields
+                if name != pri_key or
+                any(getattr(model, name) is not None for model in models)]
+
+    async def bulk_create(self, models, chunk_size=1000):
+        if not models:
+            return models
+        columns = self.insert_columns(models)
+        placeholders = f'({", ".join(["%s"] * len(columns))})'
+        pri_key = self.model_cls._pri_key
+        connection = Acquire(self.conn) if self.conn else transaction()
+        async with connection as conn:
+            for start in range(0, len(models), chunk_size):
+                chunk = models[start:start + chunk_size]
+                query = f'INSERT INTO {self.model_cls._table_name} ' \
+                        f'({", ".join(columns)}) VALUES ' \
+                        f'{", ".join([placeholders] * len(chunk))}'
+                values_list = [getattr(model, column) for model in chunk
+                               for column in columns]
+                await execute(conn, query, tuple(values_list))
+                if pri_key is not None and pri_key not in columns:
+                    await self.read_ids(conn, chunk)
+        for model in models:
+            model.mark_saved()
+        return models
+
+    # The ids of a multi-row INSERT need not be consecutive: concurrent
+    # inserts interleave under innodb_autoinc_lock_mode=2, the MySQL 8
+    # default. They are read back by the model's first unique key and stay
+    # None when it has none.
+    async def read_ids(self, conn, models):
+        key = next((columns for _, columns, unique
+                    in self.model_cls._indexes if unique), None)
+        if key is None:
+            return
+        pri_key = self.model_cls._pri_key
+        row = f'({", ".join(["%s"] * len(key))})'
+        query = f'SELECT {pri_key}, {", ".join(key)} ' \
+                f'FROM {self.model_cls._table_name} ' \
+                f'WHERE ({", ".join(key)}) IN ' \
+                f'({", ".join([row] * len(models))})'
+        values_list = [getattr(model, column) for model in models
+                       for column in key]
+        _, rows = await execute(conn, query, tuple(values_list), fetch=True)
+        ids = {tuple(row[1:]): row[0] for row in rows}
+        for model in models:
+            setattr(model, pri_key, ids.get(tuple(getattr(model, column)
+                                                  for column in key)))
+
+    async def bulk_update(self, models, *what, key=None, chunk_size=500):
+        if not models:
+            return
+        if key is None:
+            pri_key = self.model_cls._pri_key
+            if pri_key is not None:
+                key = (pri_key,)
+            else:
+                key = tuple(name for name in self.model_cls._fields
+                            if name not in what)
+        match = f'({" AND ".join(f"{column} = %s" for column in key)})'
+        connection = Acquire(self.conn) if self.conn else transaction()
+        async with connection as conn:
+            for start in range(0, len(models), chunk_size):
+                chunk = models[start:start + chunk_size]
+                keys = [[getattr(model, column) for column in key]
+                        for model in chunk]
+                set_str = []
+                set_list = []
+                for column in what:
+                    set_str.append(f'{column} = CASE ' +
+                                   f'WHEN {match} THEN %s ' * len(chunk) +
+                                   f'ELSE {column} END')
+                    for model, key_values in zip(chunk, keys):
+                        set_list.extend(key_values)
+                        set_list.append(getattr(model, column))
+                where_list = [value for key_values in keys
+                              for value in key_values]
+                query = f'UPDATE {self.model_cls._table_name} ' \
+                        f'SET {", ".join(set_str)} ' \
+                        f'WHERE {" OR ".join([match] * len(chunk))}'
+                await execute(conn, query, (*set_list, *where_list))
+        for model in models:
+            model.mark_saved(*what)
+
+    # ON DUPLICATE KEY UPDATE only fires on a primary or unique key, so an
+    # upsert that does not write all columns of one would quietly insert a
+    # duplicate row every time.
+    def check_upsert(self, columns):
+        keys = [index_columns for _, index_columns, unique
+                in self.model_cls._indexes if unique]
+        if self.model_cls._pri_key is not None:
+            keys.append((self.model_cls._pri_key,))
+        if not any(set(key) <= set(columns) for key in keys):
+            raise ValueError(f'upsert into {self.model_cls._table_name} '
+                             f'needs all columns of a unique key')
+
+    async def upsert(self, update=None, **kwargs):
+        columns = []
+        values_list = []
+        for column, value in kwargs.items():
+            if value is not None:
+                columns.append(column)
+                values_list.append(value)
+        self.check_upsert(columns)
+        if update is None:
+            update = columns
+        pri_key = self.model_cls._pri_key
+        set_str = [f'{column} = VALUES({column})' for column in update]
+        if pri_key is not None:
+            set_str.append(f'{pri_key} = LAST_INSERT_ID({pri_key})')
+        query = f'INSERT INTO {self.model_cls._table_name} ' \
+                f'({", ".join(columns)}) ' \
+                f'VALUES ({", ".join(["%s"] * len(columns))}) ' \
+                f'ON DUPLICATE KEY UPDATE {", ".join(set_str)}'
+        async with Acquire(self.conn) as conn:
+            row_id = await execute(conn, query, tuple(values_list))
+        if pri_key is not None and kwargs.get(pri_key) is None:
+            kwargs[pri_key] = row_id
+        model = self.model_cls(**kwargs)
+        model.mark_saved()
+        return model
+
+    async def bulk_upsert(self, models, update=None, chunk_size=1000):
+        if not models:
+            return models
+        columns = self.insert_columns(models)
+        self.check_upsert(columns)
+        if update is None:
+            update = columns
+        placeholders = f'({", ".join(["%s"] * len(columns))})'
+        set_str = ", ".join(f'{column} = VALUES({column})'
+                            for column in update)
+        connection = Acquire(self.conn) if self.conn else transaction()
+        async with connection as conn:
+            for start in range(0, len(models), chunk_size):
+                chunk = models[start:start + chunk_size]
+                query = f'INSERT INTO {self.model_cls._table_name} ' \
+                        f'({", ".join(columns)}) VALUES ' \
+                        f'{", ".join([placeholders] * len(chunk))} ' \
+                        f'ON DUPLICATE KEY UPDATE {set_str}'
+                values_list = [getattr(model, column) for model in chunk
+                               for column in columns]
+                await execute(conn, query, tuple(values_list))
+        for model in models:
+            model.mark_saved()
+        return models
 
     async def update(self, *what, **kwargs):
         set_str = []
@@ -189,77 +601,92 @@ class Manage:
                 where_list.append(value)
         query = f'UPDATE {self.model_cls._table_name} ' \
                 f'SET {", ".join(set_str)} WHERE {" AND ".join(where_str)}'
-        cursor = await self.conn.cursor()
-        try:
-            tuple
-            await cursor.execute(query, (*set_list, *where_list))
-        except aiomysql.Error as err:
-            await cursor.close()
-            raise ValueError(str(err.args[1]))
-        await cursor.close()
-        await self.conn.commit()
-
-    async def all(self):
-        query = f'SELECT * FROM {self.model_cls._table_name}'
-        cursor = await self.conn.cursor()
-        await cursor.execute(query)
-        users_list = []
-        field_names = [column[0] for column in cursor.description]
-        for tuple_arg in await cursor.fetchall():
-            kwarg = {}
-            for idx, field_name in enumerate(field_names):
-                kwarg[field_name] = tuple_arg[idx]
-            users_list.append(self.model_cls(**kwarg))
-        await cursor.close()
-        return users_list
-
-    async def get(self, **kwargs):
+        async with Acquire(self.conn) as conn:
+            await execute(conn, query, (*set_list, *where_list))
+
+    def build(self, field_names, rows):
+        if self.mode == 'tuple':
+            return list(rows)
+        if self.mode == 'dict':
+            return [dict(zip(field_names, tuple_arg)) for tuple_arg in rows]
+        if self.columns is not None:
+            return [self.model_cls.partial(**dict(zip(field_names,
+                                                      tuple_arg)))
+                    for tuple_arg in rows]
+        models = []
+        model_cls = self.model_cls
+        getter = model_cls._getter
+        for tuple_arg in rows:
+            model = model_cls(**dict(zip(field_names, tuple_arg)))
+            model._orig = getter(model)
+            models.append(model)
+        return models
+
+    def select(self, limit=None, offset=None, order_by=None, **kwargs):
         values_str = []
         values_list = []
         for column, value in kwargs.items():
             values_str.append(f'{column} = %s')
             values_list.append(value)
-        query = f'SELECT * FROM {self.model_cls._table_name} ' \
-                f'WHERE {" AND ".join(values_str)}'
-        cursor = await self.conn.cursor()
-        try:
-            await cursor.execute(query, tuple(values_list))
-        except aiomysql.Error as err:
-            await cursor.close()
-            raise ValueError(str(err.args[1]))
-        field_names = [column[0] for column in cursor.description]
-        for tuple_arg in await cursor.fetchall():
-            kwarg = {}
-            for idx, field_name in enumerate(field_names):
-                kwarg[field_name] = tuple_arg[idx]
-            await cursor.close()
-            return self.model_cls(**kwarg)
-        await cursor.close()
-        raise DoesNotExist(f'{self.model_cls.__name__} {kwargs}')
+        columns = ', '.join(self.columns) if self.columns else '*'
+        query = f'SELECT {columns} FROM {self.model_cls._table_name}'
+        if values_str:
+            query += f' WHERE {" AND ".join(values_str)}'
+        if order_by is not None:
+            if isinstance(order_by, str):
+                order_by = (order_by,)
+            order_str = []
+            for column in order_by:
+                desc = column.startswith('-')
+                column = column.lstrip('-')
+                if column not in self.model_cls._fields:
+                    raise ValueError(f'unknown column {column}')
+                order_str.append(f'{column} DESC' if desc else column)
+            query += f' ORDER BY {", ".join(order_str)}'
+        if limit is not None or offset is not None:
+            # MySQL has no OFFSET without LIMIT, so use the largest value.
+            query += ' LIMIT %s OFFSET %s'
+            values_list.extend((18446744073709551615 if limit is None
+                                else int(limit), int(offset or 0)))
+        return query, tuple(values_list)
+
+    async def all(self, limit=None, offset=None, order_by=None):
+        return await self.filter(limit=limit, offset=offset,
+                                 order_by=order_by)
 
-    async def filter(self, **kwargs):
-        values_str = []
-        values_list = []
-        for column, value in kwargs.items():
-            values_str.append(f'{column} = %s')
-            values_list.append(value)
-        query = f'SELECT * FROM {self.model_cls._table_name} ' \
-                f'WHERE {" AND ".join(values_str)}'
-        cursor = await self.conn.cursor()
-        try:
-            await cursor.execute(query, tuple(values_list))
-        except aiomysql.Error as err:
-            await cursor.close()
-            raise ValueError(str(err.args[1]))
-        users_list = []
-        field_names = [column[0] for column in cursor.description]
-        for tuple_arg in await cursor.fetchall():
-            kwarg = {}
-            for idx, field_name in enumerate(field_names):
-                kwarg[field_name] = tuple_arg[idx]
-            users_list.append(self.model_cls(**kwarg))
-        await cursor.close()
-        return users_list
+    async def get(self, **kwargs):
+        models = await self.filter(**kwargs)
+        if not models:
+            raise DoesNotExist(f'{self.model_cls.__name__} {kwargs}')
+        return models[0]
+
+    async def filter(self, limit=None, offset=None, order_by=None, **kwargs):
+        query, values = self.select(limit, offset, order_by, **kwargs)
+        async with Acquire(self.conn) as conn:
+            field_names, rows = await execute(conn, query, values,
+                                              fetch=True)
+        return self.build(field_names, rows)
+
+    async def iter(self, chunk_size=100, limit=None, offset=None,
+                   order_by=None, **kwargs):
+        query, values = self.select(limit, offset, order_by, **kwargs)
+        async with Acquire(self.conn) as conn:
+            cursor = await conn.cursor(aiomysql.SSCursor)
+            try:
+                try:
+                    with query_seconds.time('SELECT'):
+                        await cursor.execute(query, values)
+                except aiomysql.Error as err:
+                    raise ValueError(str(err.args[-1]))
+                field_names = [column[0] for column in cursor.description]
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for model in self.build(field_names, rows):
+                        yield model
+            finally:
+                await cursor.close()
 
     async def delete(self, **kwargs):
         values_str = []
@@ -269,38 +696,99 @@ class Manage:
             values_list.append(value)
         query = f'DELETE FROM {self.model_cls._table_name} ' \
                 f'WHERE {" AND ".join(values_str)}'
-        cursor = await self.conn.cursor()
-        try:
-            await cursor.execute(query, tuple(values_list))
-        except aiomysql.Error as err:
-            await cursor.close()
-            raise ValueError(str(err.args[1]))
-        await cursor.close()
-        await self.conn.commit()
+        async with Acquire(self.conn) as conn:
+            await execute(conn, query, tuple(values_list))
 
 
 class Model(metaclass=ModelMeta):
+    __slots__ = ('_orig', '_partial')
+
     class Meta:
         table_name = ''
 
     objects = Manage()
 
-    def __init__(self, **kwargs):
-        for field_name, field in self._fields.items():
-            value = field.validate(kwargs.get(field_name))
-            setattr(self, field_name, value)
-
+    @classmethod
+    def partial(cls, **kwargs):
+        model = cls.__new__(cls)
+        for field_name, field in cls._fields.items():
+            if field_name in kwargs:
+                value = field.validate(kwargs[field_name])
+            else:
+                value = None
+            setattr(model, field_name, value)
+        model._partial = True
+        model.mark_saved()
+        return model
+
+    def mark_saved(self, *columns):
+        current = self._getter(self)
+        if not columns:
+            self._orig = current
+            return
+        orig = self._orig or (unsaved,) * len(current)
+        self._orig = tuple(new if name in columns else old
+                           for name, old, new in zip(self._fields, orig,
+                                                     current))
+
+    def changed(self):
+        if self._orig is None:
+            return list(self._fields)
+        return [name for name, old, new in zip(self._fields, self._orig,
+                                               self._getter(self))
+                if old != new]
+
+    def to_dict(self):
+        return dict(zip(self._fields, self._getter(self)))
+
+    # save(*update) writes only the listed columns, and only those are
+    # marked clean; other dirty fields are still reported by changed().
     async def save(self, *update):
+        # Columns left out by only() read as None, and matching the row on
+        # them would silently update nothing.
+        if self._partial:
+            raise ValueError(f'{type(self).__name__} loaded with only() '
+                             f'cannot be saved')
         if update:
-            await self.objects.update(*update, **self.__dict__)
-        elif 'id' in self.__dict__ and self.id is None:
-            new = await self.objects.create(**self.__dict__)
-            self.id = new.id
+            changed = list(update)
+        elif self._orig is None:
+            if self._pri_key is not None and \
+                    getattr(self, self._pri_key) is None:
+                new = await self.objects.create(**self.to_dict())
+                setattr(self, self._pri_key, getattr(new, self._pri_key))
+            else:
+                await self.objects.create(**self.to_dict())
+            self.mark_saved()
+            return
         else:
-            await self.objects.create(**self.__dict__)
+            changed = self.changed()
+            if not changed:
+                return
+        if self._pri_key is not None and self._pri_key not in changed and \
+                getattr(self, self._pri_key) is not None:
+            where = {self._pri_key: getattr(self, self._pri_key)}
+        else:
+            orig = self._orig or self._getter(self)
+            where = {name: old for name, old in zip(self._fields, orig)
+                     if name not in changed and old is not unsaved and
+                     name != self._pri_key}
+            if not where:
+                raise ValueError(f'{type(self).__name__} has no stored '
+                                 f'column to find its row by')
+        values = {name: getattr(self, name) for name in changed}
+        await self.objects.update(*changed, **where, **values)
+        self.mark_saved(*changed)
 
     async def delete(self):
-        await self.objects.delete(self.__dict__)
+        if self._partial and (self._pri_key is None or
+                              getattr(self, self._pri_key) is None):
+            raise ValueError(f'{type(self).__name__} loaded with only() '
+                             f'cannot be deleted without its primary key')
+        if self._pri_key is not None:
+            await self.objects.delete(
+                **{self._pri_key: getattr(self, self._pri_key)})
+        else:
+            await self.objects.delete(**self.to_dict())
 
 
 class User(Model):
@@ -313,6 +801,7 @@ class User(Model):
 
     class Meta:
         table_name = 'Users'
+        unique = ['email', 'name']
 
 
 class Token(Model):
@@ -322,6 +811,9 @@ class Token(Model):
 
     class Meta:
         table_name = 'Token'
+        indexes = ['user_id']
+        unique = ['token']
+
 
 class Stat(Model):
     domain = StringField(size=255)
@@ -330,6 +822,36 @@ class Stat(Model):
     https = IntField(bool=True, required=False, default=0)
     time = DatetimeField()
     pages_count = IntField(required=False, default=0)
+    not_modified = IntField(required=False, default=0)
+    skipped = IntField(required=False, default=0)
+    oversized = IntField(required=False, default=0)
+    timeouts = IntField(required=False, default=0)
+    errors = IntField(required=False, default=0)
+    status_2xx = IntField(required=False, default=0)
+    status_3xx = IntField(required=False, default=0)
+    status_4xx = IntField(required=False, default=0)
+    status_5xx = IntField(required=False, default=0)
+    bytes = IntField(required=False, default=0, big=True)
+    avg_latency = FloatField(required=False, default=0)
+    pages_per_sec = FloatField(required=False, default=0)
 
     class Meta:
         table_name = 'CrawlerStats'
+        indexes = ['domain', 'author_id']
+        unique = [('domain', 'author_id')]
+
+
+class Page(Model):
+    url_hash = StringField(size=40)
+    url = StringField(size=2048)
+    domain = StringField(size=255)
+    etag = StringField(size=255, required=False)
+    last_modified = StringField(size=64, required=False)
+    content_hash = StringField(size=40, required=False)
+    depth = IntField(required=False, default=0)
+    time = DatetimeField()
+
+    class Meta:
+        table_name = 'CrawlerPages'
+        indexes = ['domain']
+        unique = ['url_hash']
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+try:
+    import aioredis
+except ImportError:
+    aioredis = None
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        # A bucket must hold at least one whole token, otherwise a rate
+        # below 1 rps never fills up to a request and every wait is longer.
+        self.capacity = max(1, capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        self.refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    # Takes a token even when none is available yet, so concurrent callers
+    # queue up behind each other and each gets its own exact wait time.
+    def reserve(self):
+        wait = self.delay()
+        self.tokens -= 1
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, rps, burst=None):
+        self.rps = rps
+        self.burst = burst
+        self.buckets = {}
+
+    def set_rate(self, domain, rps=None):
+        self.buckets[domain] = TokenBucket(rps or self.rps, self.burst)
+
+    def remove(self, domain):
+        self.buckets.pop(domain, None)
+
+    def bucket(self, domain):
+        if domain not in self.buckets:
+            self.set_rate(domain)
+        return self.buckets[domain]
+
+    def delay(self, domain):
+        return self.bucket(domain).delay()
+
+    def reserve(self, domain):
+        return self.bucket(domain).reserve()
+
+    async def acquire(self, domain):
+        wait = self.reserve(domain)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    # Called once a local reservation has been made by the scheduler. The
+    # in-process limiter has nothing more to check.
+    async def confirm(self, domain):
+        return 0
+
+
+class RedisRateLimiter(RateLimiter):
+    script = '''
+        redis.replicate_commands()
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local t = redis.call('TIME')
+        local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + (now - ts) * rate) - 1
+        redis.call('HMSET', KEYS[1], 'tokens', tokens, 'ts', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+        if tokens >= 0 then
+            return '0'
+        end
+        return tostring(-tokens / rate)
+    '''
+
+    def __init__(self, rps, burst=None, url='redis://localhost',
+                 prefix='ratelimit:'):
+        if aioredis is None:
+            raise RuntimeError('aioredis is required for RedisRateLimiter')
+        super().__init__(rps, burst)
+        self.url = url
+        self.prefix = prefix
+        self.redis = None
+
+    async def connect(self):
+        if self.redis is None:
+            self.redis = await aioredis.create_redis_pool(self.url)
+
+    async def close(self):
+        if self.redis is not None:
+            self.redis.close()
+            await self.redis.wait_closed()
+            self.redis = None
+
+    async def confirm(self, domain):
+        await self.connect()
+        bucket = self.bucket(domain)
+        wait = float(await self.redis.eval(
+            self.script, keys=[self.prefix + domain],
+            args=[bucket.rate, bucket.capacity]))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    async def acquire(self, domain):
+        wait = await super().acquire(domain)
+        return wait + await self.confirm(domain)
@@ -0,0 +1,107 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+
+
+class DomainScheduler:
+    def __init__(self, limiter, on_done=None, on_wait=None, loop=None):
+        self.limiter = limiter
+        self.on_done = on_done
+        self.on_wait = on_wait
+        self.loop = loop or asyncio.get_event_loop()
+        self.queues = {}
+        self.in_flight = {}
+        self.ready = []
+        self.scheduled = set()
+        self.waiters = deque()
+        self.timer = None
+        self.counter = itertools.count()
+
+    def add_domain(self, domain, rps=None, queue=None):
+        self.queues[domain] = deque() if queue is None else queue
+        self.limiter.set_rate(domain, rps)
+        self.in_flight[domain] = 0
+        # A resumed frontier arrives with pages already pending.
+        if self.queues[domain]:
+            self.push(domain)
+            self.arm()
+
+    def remove_domain(self, domain):
+        self.queues.pop(domain, None)
+        self.limiter.remove(domain)
+        self.in_flight.pop(domain, None)
+        self.scheduled.discard(domain)
+
+    def put(self, domain, item):
+        self.queues[domain].append(item)
+        if domain not in self.scheduled:
+            self.push(domain)
+            self.arm()
+
+    async def get(self):
+        while True:
+            if self.ready and self.ready[0][0] <= self.loop.time():
+                _, _, domain, delay = heapq.heappop(self.ready)
+                self.scheduled.discard(domain)
+                if self.on_wait is not None:
+                    self.on_wait(domain, delay)
+                item = self.queues[domain].popleft()
+                self.in_flight[domain] += 1
+                self.limiter.reserve(domain)
+                if self.queues[domain]:
+                    self.push(domain)
+                self.arm()
+                return domain, item
+
+            waiter = self.loop.create_future()
+            self.waiters.append(waiter)
+            self.arm()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    self.wakeup()
+                raise
+
+    def task_done(self, domain):
+        self.in_flight[domain] -= 1
+        if not self.queues[domain] and not self.in_flight[domain]:
+            self.remove_domain(domain)
+            if self.on_done is not None:
+                self.on_done(domain)
+
+    def qsize(self, domain):
+        return len(self.queues[domain])
+
+    # The delay a domain is pushed with is the time its rate limit holds
+    # it back; on_wait reports it when the domain is handed to a worker.
+    def push(self, domain):
+        delay = self.limiter.delay(domain)
+        heapq.heappush(self.ready, (self.loop.time() + delay,
+                                    next(self.counter), domain, delay))
+        self.scheduled.add(domain)
+
+    # A single timer is armed for the earliest domain in the ready heap and
+    # wakes exactly one waiting worker, so idle workers never poll.
+    def arm(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.ready or not self.waiters:
+            return
+        when = self.ready[0][0]
+        if when <= self.loop.time():
+            self.wakeup()
+        else:
+            self.timer = self.loop.call_at(when, self.wakeup)
+
+    def wakeup(self):
+        self.timer = None
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
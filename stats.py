@@ -0,0 +1,102 @@
+import asyncio
+import time
+from orm import Stat, now
+
+
+counters = ('pages_count', 'not_modified', 'skipped', 'oversized',
+            'timeouts', 'errors', 'status_2xx', 'status_3xx', 'status_4xx',
+            'status_5xx', 'bytes')
+columns = counters + ('avg_latency', 'pages_per_sec', 'status', 'time')
+
+
+# Counters live on the Stat models in memory and every dirty domain is
+# written by one batched UPDATE per interval. A finished domain stays
+# here until the flush that carries its terminal status, so that status
+# is written exactly once.
+class StatsWriter:
+    def __init__(self, interval=5, on_flush=None, loop=None):
+        self.interval = interval
+        self.on_flush = on_flush
+        self.loop = loop or asyncio.get_event_loop()
+        self.stats = {}
+        self.started = {}
+        self.latency = {}
+        self.fetches = {}
+        self.dirty = set()
+        self.finished = set()
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    def start(self):
+        self.task = self.loop.create_task(self.run())
+
+    # A failed flush keeps its domains dirty for the next one, so the loop
+    # only logs the error and carries on.
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as err:
+                print(err)
+
+    def track(self, stat):
+        self.stats[stat.domain] = stat
+        self.started[stat.domain] = time.monotonic()
+        self.latency[stat.domain] = 0
+        self.fetches[stat.domain] = 0
+        self.finished.discard(stat.domain)
+
+    def count(self, domain, counter, value=1):
+        stat = self.stats[domain]
+        setattr(stat, counter, getattr(stat, counter) + value)
+        self.dirty.add(domain)
+
+    def fetched(self, domain, latency, size):
+        self.latency[domain] += latency
+        self.fetches[domain] += 1
+        self.count(domain, 'bytes', size)
+
+    def finish(self, domain, status='Done'):
+        self.stats[domain].status = status
+        self.finished.add(domain)
+        self.dirty.add(domain)
+
+    async def flush(self):
+        async with self.lock:
+            domains = list(self.dirty)
+            self.dirty.clear()
+            stats = []
+            for domain in domains:
+                stat = self.stats[domain]
+                elapsed = time.monotonic() - self.started[domain]
+                if self.fetches[domain]:
+                    stat.avg_latency = round(
+                        self.latency[domain] / self.fetches[domain], 4)
+                if elapsed > 0:
+                    stat.pages_per_sec = round(stat.pages_count / elapsed, 2)
+                stat.time = now()
+                stats.append(stat)
+            try:
+                await Stat.objects.bulk_update(stats, *columns,
+                                               key=('domain', 'author_id'))
+            except Exception as err:
+                print(err)
+                self.dirty.update(domains)
+            else:
+                for domain in domains:
+                    if domain in self.finished and domain not in self.dirty:
+                        self.release(domain)
+            if self.on_flush is not None:
+                await self.on_flush()
+
+    def release(self, domain):
+        self.finished.discard(domain)
+        del self.stats[domain], self.started[domain]
+        del self.latency[domain], self.fetches[domain]
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
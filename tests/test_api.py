@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+
+for name in ('aiohttp', 'aiomysql', 'aio_pika', 'aioelasticsearch'):
+    pytest.importorskip(name)
+
+import api
+from aiohttp import ClientSession, web
+from cache import TTLCache
+from orm import Manage
+from bench.fakes import start_app
+
+
+class AuthMS(api.AuthMS):
+    def __init__(self):
+        super().__init__(transport=None, batch_delay=0)
+        self.release = asyncio.Event()
+
+    async def send_request(self, type, data, timeout):
+        await self.release.wait()
+        return {'status': 'ok', 'data': {token: {'status': 'ok', 'data': {
+            'id': 7, 'expire_date': '2099-01-01 00:00:00'}}
+            for token in data['tokens']}}
+
+
+def test_joined_validation_is_not_cached_after_invalidation(monkeypatch):
+    auth_ms = AuthMS()
+    monkeypatch.setattr(api, 'auth_ms', auth_ms)
+    monkeypatch.setattr(api, 'token_cache', TTLCache(100, 300))
+    monkeypatch.setattr(api, 'invalidated', TTLCache(100, 300))
+
+    async def run():
+        first = asyncio.ensure_future(api.validate_token('token'))
+        await asyncio.sleep(0.01)
+        # The login broadcast lands after the batch went out but before a
+        # second caller joins the same validation.
+        api.evict_user(7)
+        joined = asyncio.ensure_future(api.validate_token('token'))
+        await asyncio.sleep(0.01)
+        auth_ms.release.set()
+        return await first, await joined
+
+    first, joined = api.loop.run_until_complete(run())
+    assert first['status'] == joined['status'] == 'ok'
+    assert api.token_cache.get('token') is None
+
+
+def test_stat_reads_bounded_pages(monkeypatch):
+    rows = [(f'http://site{i}.com', 'Done', '2020-01-01 00:00:00', i,
+             *[0] * len(api.stat_counters)) for i in range(250)]
+    pages = []
+
+    async def validate_token(token):
+        return {'status': 'ok', 'data': {'id': 7}}
+
+    async def filter(self, limit=None, offset=None, order_by=None, **kwargs):
+        pages.append((limit, offset))
+        return rows[offset:offset + limit]
+
+    monkeypatch.setattr(api, 'validate_token', validate_token)
+    monkeypatch.setattr(Manage, 'filter', filter)
+
+    async def run():
+        app = web.Application()
+        app.add_routes([web.get('/stat', api.stat)])
+        runner, base = await start_app(app)
+        try:
+            async with ClientSession() as session:
+                results = []
+                for query in ('', '?offset=240', '?limit=1001'):
+                    async with session.get(f'{base}/stat{query}', headers={
+                            'X-Token': 'token'}) as response:
+                        results.append((response.status,
+                                        await response.text()))
+                return results
+        finally:
+            await runner.cleanup()
+
+    (status, body), (_, tail), (too_many, _) = api.loop.run_until_complete(
+        run())
+    assert status == 200
+    assert [row['pages'] for row in json.loads(body)['data']] == list(
+        range(250))
+    assert len(json.loads(tail)['data']) == 10
+    assert too_many == 400
+    assert pages == [(100, 0), (100, 100), (100, 200), (100, 240)]
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import queue
+import pytest
+from types import SimpleNamespace
+
+for name in ('aiohttp', 'aiomysql', 'aio_pika', 'aioelasticsearch'):
+    pytest.importorskip(name)
+
+import crawler
+from fetcher import FetchResult
+from frontier import Frontier
+from orm import Manage, Page, Stat
+
+
+root = 'http://example.com'
+urls = [f'{root}/p{i}' for i in range(4)]
+
+
+def make_crawler(tmp_path, fetch, finished):
+    worker = crawler.Crawler(max_tasks=2, max_rps=1000, max_depth=3,
+                             frontier_dir=str(tmp_path), fetcher=object())
+    worker.fetch = fetch
+    worker.scheduler.on_done = finished.append
+    return worker
+
+
+def open_frontier(worker):
+    frontier = Frontier(os.path.join(worker.frontier_dir,
+                                     f'{crawler.url_id(root)}.sqlite'))
+    worker.frontiers[root] = worker.seen_urls[root] = frontier
+    worker.scheduler.add_domain(root, None, frontier)
+    return frontier
+
+
+async def run_workers(worker, until):
+    tasks = [asyncio.ensure_future(worker.work())
+             for _ in range(worker.max_tasks)]
+    for _ in range(500):
+        if until():
+            break
+        await asyncio.sleep(0.01)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_stopped_crawl_resumes_pages_in_flight(tmp_path):
+    started = []
+    fetched = []
+    finished = []
+
+    async def stall(url, depth, root):
+        started.append(url)
+        await asyncio.sleep(3600)
+
+    async def fetch(url, depth, root):
+        fetched.append(url)
+        return False
+
+    async def stop():
+        worker = make_crawler(tmp_path, stall, finished)
+        frontier = open_frontier(worker)
+        for url in urls:
+            frontier.add(url)
+            worker.scheduler.put(root, (url, 1))
+        await run_workers(worker, lambda: len(started) == worker.max_tasks)
+        frontier.close()
+
+    async def resume():
+        worker = make_crawler(tmp_path, fetch, finished)
+        frontier = open_frontier(worker)
+        await run_workers(worker, lambda: finished)
+        frontier.close(remove=True)
+
+    crawler.loop.run_until_complete(stop())
+    assert len(started) == 2
+    assert finished == []
+
+    crawler.loop.run_until_complete(resume())
+    assert sorted(fetched) == urls
+    assert finished == [root]
+
+
+def test_worker_survives_unexpected_errors(tmp_path):
+    fetched = []
+    finished = []
+
+    async def fetch(url, depth, root):
+        fetched.append(url)
+        raise ValueError('lost connection')
+
+    async def crawl():
+        worker = make_crawler(tmp_path, fetch, finished)
+        worker.writer.track(SimpleNamespace(domain=root, errors=0))
+        worker.scheduler.add_domain(root)
+        for url in urls:
+            worker.scheduler.put(root, (url, 1))
+        await run_workers(worker, lambda: finished)
+        return worker.writer.stats[root]
+
+    stat = crawler.loop.run_until_complete(crawl())
+    assert sorted(fetched) == urls
+    assert stat.errors == len(urls)
+
+
+def test_fetch_keeps_only_changed_pages(tmp_path, monkeypatch):
+    stored = Page(url_hash=crawler.url_id(urls[0]), url=urls[0], domain=root,
+                  etag='"v1"', depth=1, time='2020-01-01 00:00:00')
+    stored.mark_saved()
+    lookups = []
+    requests = []
+
+    async def filter(self, **kwargs):
+        lookups.append(kwargs['url_hash'])
+        return [stored] if kwargs['url_hash'] == stored.url_hash else []
+
+    async def get(url, headers):
+        requests.append((url, headers))
+        if url == urls[0]:
+            return FetchResult(304, {}, 'not_modified')
+        return FetchResult(200, {'ETag': '"v2"'}, 'ok', b'<p>new</p>')
+
+    async def index_page(url, text, root):
+        pass
+
+    monkeypatch.setattr(Manage, 'filter', filter)
+    worker = make_crawler(tmp_path, None, [])
+    worker.fetch = crawler.Crawler.fetch.__get__(worker)
+    worker.fetcher = SimpleNamespace(get=get)
+    worker.index_page = index_page
+    worker.writer.track(Stat(domain=root, status='Crawling', author_id=1,
+                             time='2020-01-01 00:00:00'))
+    worker.seen_urls[root] = set()
+
+    async def crawl():
+        for url in (urls[0], urls[1], urls[1]):
+            await worker.fetch(url, 1, root)
+
+    crawler.loop.run_until_complete(crawl())
+    assert requests == [(urls[0], {'If-None-Match': '"v1"'}),
+                        (urls[1], {}), (urls[1], {'If-None-Match': '"v2"'})]
+    assert lookups == [crawler.url_id(urls[0]), crawler.url_id(urls[1])]
+    assert list(worker.dirty_pages) == [urls[1]]
+
+
+class FakeProcess:
+    def __init__(self, target, args):
+        self.args = args
+        self.exitcode = None
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return self.exitcode is None
+
+
+class FakeContext:
+    Queue = queue.Queue
+    Process = FakeProcess
+
+
+class FakeMessage:
+    def __init__(self):
+        self.acked = False
+
+    def ack(self):
+        self.acked = True
+
+
+def test_supervisor_restarts_a_worker_that_exited(monkeypatch):
+    refreshes = []
+
+    async def put_refresh_interval(es, index, interval):
+        refreshes.append(interval)
+
+    monkeypatch.setattr(crawler.multiprocessing, 'get_context',
+                        lambda method: FakeContext())
+    monkeypatch.setattr(crawler, 'put_refresh_interval', put_refresh_interval)
+    supervisor = crawler.Supervisor(2, options={'frontier_dir': '/data'})
+    supervisor.es = None
+    for index in range(2):
+        supervisor.spawn(index)
+    domains = [f'http://site{i}.com' for i in range(20)]
+    first, second = [d for d in domains if crawler.route(d, 2) == 0][:2]
+    other = next(d for d in domains if crawler.route(d, 2) == 1)
+    messages = [FakeMessage() for _ in range(3)]
+    for domain, message in zip([first, second, other], messages):
+        supervisor.dispatch({'domain': domain}, message)
+
+    async def run():
+        supervisor.reports.put(('scheduled', 0, 0))
+        supervisor.reports.put(('busy', 0, True))
+        supervisor.reports.put(None)
+        await supervisor.collect()
+        # Worker 0 takes its second task and dies before scheduling it.
+        supervisor.inboxes[0].get()
+        supervisor.processes[0].exitcode = 1
+        await supervisor.check_workers()
+
+    old = supervisor.processes[:]
+    crawler.loop.run_until_complete(run())
+    assert [m.acked for m in messages] == [True, False, False]
+    assert supervisor.processes[0] is not old[0]
+    assert supervisor.processes[1] is old[1]
+    assert supervisor.processes[0].args[-1] == {'frontier_dir': '/data'}
+    assert supervisor.inboxes[0].get_nowait() == (1, {'domain': second})
+    assert supervisor.inboxes[0].empty()
+    assert supervisor.busy == set()
+    assert refreshes == [None, 1]
@@ -0,0 +1,36 @@
+import pytest
+import extract
+
+backends = ['html.parser']
+if extract.etree is not None:
+    backends.append('lxml')
+
+root = 'http://example.com'
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_inline_tags_do_not_split_words(backend):
+    text, _ = extract.extract('<html><body><p><b>foo</b>bar <i>baz</i>'
+                              '<a href="/x">qux</a>.</p></body></html>',
+                              root, backend)
+    assert text == 'foobar bazqux.'
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_block_tags_separate_text(backend):
+    text, _ = extract.extract('<html><head><title>Title</title></head>'
+                              '<body><h1>Head</h1><p>one</p><p>two<br>three'
+                              '</p><ul><li>a</li><li>b</li></ul>'
+                              '<script>var x;</script></body></html>',
+                              root, backend)
+    assert text == 'Head one two three a b'
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_links_are_normalised(backend):
+    _, links = extract.extract('<p><a href="/a#top">a</a>'
+                               '<a href="b">b</a>'
+                               '<a href="http://other.com/c">c</a>'
+                               '<a href="mailto:x@example.com">x</a></p>',
+                               root, backend)
+    assert links == {f'{root}/a', f'{root}/b'}
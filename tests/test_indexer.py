@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from urllib.parse import urlparse
+
+for name in ('aiohttp', 'aioelasticsearch', 'elasticsearch'):
+    pytest.importorskip(name)
+
+from aiohttp import web
+from aioelasticsearch import Elasticsearch
+from indexer import BulkIndexer, ensure_index, migrate_index
+from bench.fakes import FakeElasticsearch, start_app
+
+
+# Answers the first `down` bulk requests with 429 and rejects the first
+# `failures` documents it is sent, then accepts all.
+class FlakyElasticsearch(FakeElasticsearch):
+    def __init__(self, failures=0, down=0):
+        super().__init__()
+        self.failures = failures
+        self.down = down
+        self.bulks = []
+
+    def failed(self):
+        if self.failures:
+            self.failures -= 1
+            return True
+        return False
+
+    async def bulk(self, request):
+        self.bulks.append(len((await request.text()).splitlines()) // 2)
+        if self.down:
+            self.down -= 1
+            return web.json_response({'error': {
+                'type': 'es_rejected_execution_exception'}}, status=429)
+        return await super().bulk(request)
+
+
+def run(test, fake, **kwargs):
+    async def main():
+        runner, base = await start_app(fake.app())
+        url = urlparse(base)
+        es = Elasticsearch(hosts=[{'host': url.hostname, 'port': url.port}])
+        try:
+            await test(BulkIndexer(es, 'crawling', backoff=0.01, **kwargs))
+        finally:
+            await es.close()
+            await runner.cleanup()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def doc(i):
+    return {'url': f'http://example.com/p{i}', 'content': f'page {i}'}
+
+
+def test_documents_are_sent_in_batches():
+    fake = FlakyElasticsearch()
+
+    async def test(indexer):
+        for i in range(25):
+            await indexer.add(doc(i), doc_id=f'p{i}')
+        await indexer.close()
+
+    run(test, fake, max_docs=10)
+    assert sorted(fake.bulks) == [5, 10, 10]
+    assert sorted(fake.indices['crawling']) == sorted(f'p{i}'
+                                                      for i in range(25))
+
+
+def test_rejected_documents_are_retried_in_a_smaller_bulk():
+    fake = FlakyElasticsearch(failures=2)
+
+    async def test(indexer):
+        for i in range(5):
+            await indexer.add(doc(i), doc_id=f'p{i}')
+        await indexer.close()
+
+    run(test, fake, max_docs=5)
+    assert fake.bulks == [5, 2]
+    assert len(fake.indices['crawling']) == 5
+    assert fake.indices['crawling']['p0'] == doc(0)
+
+
+def test_failed_bulk_request_is_retried_then_dropped():
+    fake = FlakyElasticsearch(down=4)
+
+    async def test(indexer):
+        for i in range(10):
+            await indexer.add(doc(i), doc_id=f'p{i}')
+        await indexer.close()
+
+    run(test, fake, max_docs=5, max_pending=1, retries=2)
+    # Three attempts for the first batch, two for the second.
+    assert fake.bulks == [5] * 5
+    assert sorted(fake.indices['crawling']) == sorted(f'p{i}'
+                                                      for i in range(5, 10))
+
+
+def test_drain_flushes_a_partial_batch():
+    fake = FlakyElasticsearch()
+
+    async def test(indexer):
+        for i in range(3):
+            await indexer.add(doc(i), doc_id=f'p{i}')
+        assert fake.bulks == []
+        await indexer.drain()
+        assert fake.bulks == [3]
+        assert not indexer.pending
+        assert len(fake.indices['crawling']) == 3
+
+    run(test, fake, max_docs=10, flush_interval=60)
+
+
+def test_migrate_index_moves_to_a_new_version():
+    fake = FlakyElasticsearch()
+    body = {'mappings': {'properties': {'content': {
+        'type': 'text', 'term_vector': 'with_positions_offsets'}}}}
+
+    async def test(indexer):
+        es = indexer.es
+        await es.indices.create(index='crawling')
+        await es.index(index='crawling', id='p0', body=doc(0))
+        with pytest.raises(ValueError):
+            await ensure_index(es, 'crawling')
+        await migrate_index(es, 'crawling', body, 1)
+        await migrate_index(es, 'crawling', body, 1)
+        await ensure_index(es, 'crawling')
+        await indexer.add(doc(1), doc_id='p1')
+        await indexer.drain()
+        await migrate_index(es, 'crawling', body, 2)
+
+    run(test, fake)
+    assert fake.aliases == {'crawling': 'crawling_v2'}
+    assert list(fake.mappings) == ['crawling_v2']
+    assert fake.mappings['crawling_v2'] == body['mappings']
+    assert fake.indices['crawling_v2'] == {'p0': doc(0), 'p1': doc(1)}
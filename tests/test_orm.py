@@ -0,0 +1,205 @@
+import uuid
+import pytest
+
+pytest.importorskip('aiomysql')
+
+import orm
+from orm import Model, Manage, StringField, IntField, DatetimeField
+
+
+class Tag(Model):
+    name = StringField(size=32)
+
+    class Meta:
+        table_name = 'Tags'
+
+
+class Visit(Model):
+    domain = StringField(size=255)
+    status = StringField(size=64)
+    hits = IntField(required=False, default=0)
+
+    class Meta:
+        table_name = 'Visits'
+
+
+# Same columns as Token, in a scratch table that starts without indexes.
+class PlainToken(Model):
+    token = StringField(size=36)
+    user_id = IntField()
+    expire_date = DatetimeField()
+
+    class Meta:
+        table_name = 'TestToken'
+
+
+class IndexedToken(PlainToken):
+    class Meta:
+        table_name = 'TestToken'
+        indexes = ['user_id']
+        unique = ['token']
+
+
+class Account(Model):
+    id = IntField(pri_key=True, auto_inc=True)
+    email = StringField(size=32)
+    name = StringField(size=32, required=False)
+
+    class Meta:
+        table_name = 'TestAccount'
+        unique = ['email']
+
+
+# Uses the MySQL database from orm.db_config and skips without one.
+@pytest.fixture
+def db():
+    async def drop():
+        async with orm.Acquire() as conn:
+            await orm.execute(conn, 'DROP TABLE IF EXISTS TestToken')
+            await orm.execute(conn, 'DROP TABLE IF EXISTS TestAccount')
+
+    try:
+        orm.loop.run_until_complete(drop())
+    except Exception as err:
+        orm.loop.run_until_complete(orm.close())
+        pytest.skip(f'no database: {err}')
+    yield
+    orm.loop.run_until_complete(drop())
+    orm.loop.run_until_complete(orm.close())
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    calls = []
+
+    async def update(self, *what, **kwargs):
+        calls.append((what, kwargs))
+
+    monkeypatch.setattr(Manage, 'update', update)
+    return calls
+
+
+def load(model_cls, **values):
+    return model_cls.objects.build(list(values), [tuple(values.values())])[0]
+
+
+def test_single_field_model_tracks_changes():
+    tag = load(Tag, name='news')
+    assert tag.changed() == []
+    tag.name = 'sport'
+    assert tag.changed() == ['name']
+    tag.mark_saved()
+    assert tag.changed() == []
+    assert tag.to_dict() == {'name': 'sport'}
+
+
+def test_save_listed_columns_keeps_other_fields_dirty(updates):
+    visit = load(Visit, domain='http://a.com', status='Crawling', hits=1)
+    visit.status = 'Done'
+    visit.hits = 5
+    orm.loop.run_until_complete(visit.save('hits'))
+    assert updates == [(('hits',), {'domain': 'http://a.com',
+                                    'status': 'Crawling', 'hits': 5})]
+    assert visit.changed() == ['status']
+
+    orm.loop.run_until_complete(visit.save())
+    assert updates[1] == (('status',), {'domain': 'http://a.com',
+                                        'hits': 5, 'status': 'Done'})
+    assert visit.changed() == []
+
+
+def test_partial_instances_cannot_be_saved(updates):
+    visit = Visit.objects.only('domain', 'hits').build(
+        ['domain', 'hits'], [('http://a.com', 1)])[0]
+    assert visit.status is None
+    visit.hits = 2
+    with pytest.raises(ValueError):
+        orm.loop.run_until_complete(visit.save())
+    with pytest.raises(ValueError):
+        orm.loop.run_until_complete(visit.delete())
+    assert updates == []
+
+
+def test_save_without_an_id_matches_loaded_columns(updates):
+    account = Account(email='a@example.com', name='a')
+    account.mark_saved()
+    account.name = 'b'
+    orm.loop.run_until_complete(account.save())
+    assert updates == [(('name',), {'email': 'a@example.com', 'name': 'b'})]
+    account.email = 'c@example.com'
+    account.name = 'c'
+    with pytest.raises(ValueError):
+        orm.loop.run_until_complete(account.save())
+
+
+def test_upsert_needs_a_unique_key():
+    with pytest.raises(ValueError):
+        orm.loop.run_until_complete(Visit.objects.upsert(
+            domain='http://a.com', status='Crawling'))
+    with pytest.raises(ValueError):
+        orm.loop.run_until_complete(orm.Stat.objects.upsert(
+            domain='http://a.com', status='Crawling'))
+
+
+def test_lookups_use_declared_indexes(db):
+    async def plans():
+        await PlainToken.objects.create_table()
+        tokens = [PlainToken(token=str(uuid.uuid4()), user_id=i % 1000,
+                             expire_date='2030-01-01 00:00:00')
+                  for i in range(50000)]
+        await PlainToken.objects.bulk_create(tokens)
+        probe = tokens[len(tokens) // 2].token
+        before = await PlainToken.objects.explain(token=probe)
+        await IndexedToken.objects.migrate()
+        after = await IndexedToken.objects.explain(token=probe)
+        by_user = await IndexedToken.objects.explain(user_id=7)
+        found = await IndexedToken.objects.get(token=probe)
+        return before[0], after[0], by_user[0], found.token == probe
+
+    before, after, by_user, found = orm.loop.run_until_complete(plans())
+    assert before['key'] is None
+    assert before['rows'] > 1000
+    assert after['key'] == 'uq_token'
+    assert after['rows'] == 1
+    assert by_user['key'] == 'idx_user_id'
+    assert found
+
+
+def test_create_table_emits_indexes(db):
+    async def plan():
+        await IndexedToken.objects.create_table()
+        await IndexedToken.objects.bulk_create([
+            IndexedToken(token=f'token-{i}', user_id=i,
+                         expire_date='2030-01-01 00:00:00')
+            for i in range(100)])
+        return (await IndexedToken.objects.explain(token='token-50'))[0]
+
+    assert orm.loop.run_until_complete(plan())['key'] == 'uq_token'
+
+
+def test_migrate_refuses_to_skip_a_unique_index(db):
+    async def migrate():
+        await PlainToken.objects.create_table()
+        await PlainToken.objects.bulk_create([
+            PlainToken(token='token', user_id=i,
+                       expire_date='2030-01-01 00:00:00')
+            for i in range(2)])
+        await IndexedToken.objects.migrate()
+
+    with pytest.raises(ValueError, match='uq_token'):
+        orm.loop.run_until_complete(migrate())
+
+
+def test_bulk_create_reads_ids_back(db):
+    async def create():
+        await Account.objects.create_table()
+        await Account.objects.create(email='first@example.com')
+        accounts = await Account.objects.bulk_create([
+            Account(email=f'user{i}@example.com') for i in range(5)])
+        stored = {account.email: account.id
+                  for account in await Account.objects.all()}
+        return accounts, stored
+
+    accounts, stored = orm.loop.run_until_complete(create())
+    assert all(account.id == stored[account.email] for account in accounts)
+    assert len(set(stored.values())) == 6
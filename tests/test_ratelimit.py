@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+import ratelimit
+from ratelimit import TokenBucket, RateLimiter, RedisRateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+# Stands in for aioredis: records the bucket passed to the script and
+# answers as if a token was available.
+class FakeRedis:
+    def __init__(self):
+        self.calls = []
+
+    async def create_redis_pool(self, url):
+        return self
+
+    async def eval(self, script, keys, args):
+        self.calls.append((keys, args))
+        return '0'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+def test_fractional_rate_waits_the_full_interval(clock):
+    bucket = TokenBucket(0.5)
+    assert bucket.capacity == 1
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(2)
+    clock.now += 2
+    assert bucket.reserve() == pytest.approx(2)
+
+
+def test_reservations_queue_behind_each_other(clock):
+    bucket = TokenBucket(10)
+    assert [bucket.reserve() for _ in range(10)] == [0] * 10
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+    clock.now += 0.25
+    assert bucket.delay() == pytest.approx(0.05)
+
+
+def test_domain_override(clock):
+    limiter = RateLimiter(3)
+    limiter.set_rate('http://a.com', 0.5)
+    limiter.set_rate('http://b.com')
+    assert limiter.bucket('http://a.com').rate == 0.5
+    assert limiter.bucket('http://b.com').rate == 3
+    assert limiter.bucket('http://c.com').rate == 3
+    limiter.reserve('http://a.com')
+    assert limiter.delay('http://a.com') == pytest.approx(2)
+    assert limiter.delay('http://b.com') == 0
+
+
+def test_shared_limiter_uses_whole_token_capacity(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(ratelimit, 'aioredis', redis)
+    limiter = RedisRateLimiter(3, prefix='test:')
+    limiter.set_rate('http://a.com', 0.5)
+    wait = asyncio.new_event_loop().run_until_complete(
+        limiter.confirm('http://a.com'))
+    assert wait == 0
+    assert redis.calls == [(['test:http://a.com'], [0.5, 1])]
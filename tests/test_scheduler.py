@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from scheduler import DomainScheduler
+
+
+# Holds each domain back for a fixed delay and records reservations.
+class FakeLimiter:
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.reserved = []
+
+    def set_rate(self, domain, rps=None):
+        pass
+
+    def remove(self, domain):
+        pass
+
+    def delay(self, domain):
+        return self.delays.get(domain, 0)
+
+    def reserve(self, domain):
+        self.reserved.append(domain)
+
+
+def run(main):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main(loop))
+    finally:
+        loop.close()
+
+
+def test_on_wait_reports_the_rate_limit_delay():
+    waits = []
+
+    async def main(loop):
+        scheduler = DomainScheduler(
+            FakeLimiter({'a': 0.05}), loop=loop,
+            on_wait=lambda domain, delay: waits.append((domain, delay)))
+        scheduler.add_domain('a')
+        scheduler.add_domain('b')
+        scheduler.put('a', 1)
+        scheduler.put('b', 2)
+        start = loop.time()
+        got = [await scheduler.get(), await scheduler.get()]
+        return got, loop.time() - start
+
+    got, elapsed = run(main)
+    assert got == [('b', 2), ('a', 1)]
+    assert waits == [('b', 0), ('a', pytest.approx(0.05))]
+    assert elapsed >= 0.05
+
+
+def test_domains_are_served_when_their_delay_runs_out():
+    async def main(loop):
+        limiter = FakeLimiter({'a': 0.1, 'c': 0.05})
+        scheduler = DomainScheduler(limiter, loop=loop)
+        for domain in 'abc':
+            scheduler.add_domain(domain)
+        scheduler.put('a', 1)
+        scheduler.put('b', 2)
+        scheduler.put('b', 3)
+        scheduler.put('c', 4)
+        start = loop.time()
+        served = []
+        for _ in range(4):
+            domain, item = await scheduler.get()
+            served.append((domain, item, loop.time() - start))
+        return served, limiter.reserved
+
+    served, reserved = run(main)
+    assert [(domain, item) for domain, item, _ in served] == [
+        ('b', 2), ('b', 3), ('c', 4), ('a', 1)]
+    assert served[1][2] < 0.05 <= served[2][2] < 0.1 <= served[3][2]
+    assert reserved == ['b', 'b', 'c', 'a']
+
+
+def test_a_ready_domain_wakes_exactly_one_waiter():
+    async def main(loop):
+        scheduler = DomainScheduler(FakeLimiter(), loop=loop)
+        scheduler.add_domain('a')
+        getters = [loop.create_task(scheduler.get()) for _ in range(3)]
+        await asyncio.sleep(0)
+        scheduler.put('a', 1)
+        await asyncio.sleep(0)
+        done = [getter for getter in getters if getter.done()]
+        waiting = len(scheduler.waiters)
+        for getter in getters:
+            getter.cancel()
+        await asyncio.gather(*getters, return_exceptions=True)
+        return [getter.result() for getter in done], waiting, scheduler
+
+    results, waiting, scheduler = run(main)
+    assert results == [('a', 1)]
+    assert waiting == 2
+    assert not scheduler.waiters
+
+
+def test_cancelled_waiter_hands_its_wakeup_on():
+    async def main(loop):
+        scheduler = DomainScheduler(FakeLimiter(), loop=loop)
+        scheduler.add_domain('a')
+        first = loop.create_task(scheduler.get())
+        second = loop.create_task(scheduler.get())
+        await asyncio.sleep(0)
+        # The wakeup goes to the first waiter, which is cancelled before
+        # it gets to run.
+        scheduler.put('a', 1)
+        first.cancel()
+        return await asyncio.wait_for(second, 1), first
+
+    result, first = run(main)
+    assert result == ('a', 1)
+    assert first.cancelled()
+
+
+def test_task_done_reports_a_finished_domain():
+    finished = []
+
+    async def main(loop):
+        scheduler = DomainScheduler(FakeLimiter(), on_done=finished.append,
+                                    loop=loop)
+        scheduler.add_domain('a')
+        scheduler.put('a', 1)
+        scheduler.put('a', 2)
+        await scheduler.get()
+        await scheduler.get()
+        scheduler.task_done('a')
+        assert finished == []
+        scheduler.task_done('a')
+        return scheduler
+
+    scheduler = run(main)
+    assert finished == ['a']
+    assert 'a' not in scheduler.queues
@@ -0,0 +1,163 @@
+import asyncio
+import uuid
+from aio_pika import connect, Message, DeliveryMode, ExchangeType
+
+
+class Consumer:
+    def __init__(self, queue, cancel):
+        self.queue = queue
+        self.cancel_consumer = cancel
+
+    async def cancel(self):
+        await self.cancel_consumer()
+
+
+class AmqpTransport:
+    def __init__(self, url, loop=None):
+        self.url = url
+        self.loop = loop or asyncio.get_event_loop()
+        self.connection = None
+        self.channel = None
+        self.exchanges = {}
+
+    async def connect(self):
+        if self.connection is None:
+            self.connection = await connect(self.url, loop=self.loop)
+            self.channel = await self.connection.channel()
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+    async def publish(self, routing_key, body, correlation_id=None,
+                      reply_to=None, persistent=False):
+        delivery_mode = DeliveryMode.PERSISTENT if persistent else None
+        await self.channel.default_exchange.publish(
+            Message(body, content_type='application/json',
+                    correlation_id=correlation_id, reply_to=reply_to,
+                    delivery_mode=delivery_mode),
+            routing_key=routing_key)
+
+    async def consume(self, queue, callback, prefetch=None, durable=False,
+                      no_ack=False):
+        if prefetch is not None:
+            await self.channel.set_qos(prefetch_count=prefetch)
+        if queue is None:
+            amqp_queue = await self.channel.declare_queue(exclusive=True)
+        else:
+            amqp_queue = await self.channel.declare_queue(queue,
+                                                          durable=durable)
+        tag = await amqp_queue.consume(callback, no_ack=no_ack)
+        return Consumer(amqp_queue.name, lambda: amqp_queue.cancel(tag))
+
+    async def exchange(self, name):
+        if name not in self.exchanges:
+            self.exchanges[name] = await self.channel.declare_exchange(
+                name, ExchangeType.FANOUT)
+        return self.exchanges[name]
+
+    async def broadcast(self, exchange, body):
+        exchange = await self.exchange(exchange)
+        await exchange.publish(Message(body, content_type='application/json'),
+                               routing_key='')
+
+    async def subscribe(self, exchange, callback):
+        exchange = await self.exchange(exchange)
+        amqp_queue = await self.channel.declare_queue(exclusive=True)
+        await amqp_queue.bind(exchange)
+        tag = await amqp_queue.consume(callback, no_ack=True)
+        return Consumer(amqp_queue.name, lambda: amqp_queue.cancel(tag))
+
+
+class MemoryMessage:
+    def __init__(self, body, correlation_id=None, reply_to=None):
+        self.body = body
+        self.correlation_id = correlation_id
+        self.reply_to = reply_to
+        self.on_ack = None
+
+    def process(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ack()
+
+    def ack(self):
+        if self.on_ack is not None:
+            self.on_ack()
+            self.on_ack = None
+
+
+class MemoryBroker:
+    def __init__(self):
+        self.queues = {}
+        self.exchanges = {}
+
+    def queue(self, name):
+        if name not in self.queues:
+            self.queues[name] = asyncio.Queue()
+        return self.queues[name]
+
+
+class MemoryTransport:
+    def __init__(self, broker=None, loop=None):
+        self.broker = broker or MemoryBroker()
+        self.loop = loop or asyncio.get_event_loop()
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def publish(self, routing_key, body, correlation_id=None,
+                      reply_to=None, persistent=False):
+        self.broker.queue(routing_key).put_nowait(
+            MemoryMessage(body, correlation_id, reply_to))
+
+    def dispatch(self, callback, message):
+        result = callback(message)
+        if asyncio.iscoroutine(result):
+            self.loop.create_task(result)
+
+    async def consume(self, queue, callback, prefetch=None, durable=False,
+                      no_ack=False):
+        if queue is None:
+            queue = f'amq.gen-{uuid.uuid4()}'
+        messages = self.broker.queue(queue)
+        slots = asyncio.Semaphore(prefetch) if prefetch else None
+
+        async def deliver():
+            while True:
+                message = await messages.get()
+                if slots is not None:
+                    await slots.acquire()
+                    if no_ack:
+                        slots.release()
+                    else:
+                        message.on_ack = slots.release
+                self.dispatch(callback, message)
+
+        task = self.loop.create_task(deliver())
+
+        async def cancel():
+            task.cancel()
+
+        return Consumer(queue, cancel)
+
+    async def broadcast(self, exchange, body):
+        for callback in list(self.broker.exchanges.get(exchange, ())):
+            self.dispatch(callback, MemoryMessage(body))
+
+    async def subscribe(self, exchange, callback):
+        callbacks = self.broker.exchanges.setdefault(exchange, [])
+        callbacks.append(callback)
+
+        async def cancel():
+            callbacks.remove(callback)
+
+        return Consumer(None, cancel)